@@ -9,7 +9,6 @@ import time
 from typing import Any
 
 from flask import Blueprint, Response, jsonify, request, stream_with_context
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from api.services.rag import rag_service
 from core.constants import (
@@ -18,20 +17,14 @@ from core.constants import (
     CHAT_CONTEXT_TRAILING_MESSAGES,
     DEFAULT_NB_SOURCES,
     META_MATIERE,
-    SYSTEM_PROMPT,
 )
+from core.prompts import build_messages
 from core.retrieval import enhanced_retrieve
 from core.validators import validate_nb_sources, validate_question, validate_subjects
 
 logger = logging.getLogger(__name__)
 chat_bp = Blueprint("chat", __name__)
 
-PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_PROMPT),
-    MessagesPlaceholder("chat_history"),
-    ("human", "{question}"),
-])
-
 # ---------------------------------------------------------------------------
 # Video intent detection
 # ---------------------------------------------------------------------------
@@ -158,9 +151,7 @@ def chat() -> Response:
     def generate():
         start_time = time.time()
 
-        filter_dict = None
-        if subjects:
-            filter_dict = {META_MATIERE: {"$in": subjects}}
+        filter_dict = {META_MATIERE: {"$in": sorted(subjects)}} if subjects else None
 
         chat_ctx = ""
         if svc.chat_history:
@@ -202,11 +193,7 @@ def chat() -> Response:
         }
         yield f"data: {json.dumps(meta_payload, ensure_ascii=False)}\n\n"
 
-        messages = PROMPT_TEMPLATE.invoke({
-            "context": context,
-            "chat_history": svc.chat_history,
-            "question": question,
-        })
+        messages = build_messages(context, svc.chat_history, question)
 
         full_response = ""
         for chunk in svc.llm.stream(messages):
@@ -2,19 +2,25 @@
 RAG Service -- Singleton managing shared resources (vectorstore, LLM, BM25).
 
 All blueprints share these resources through ``rag_service``.
+
+``langchain_openai`` and the Chroma wrapper are imported inside the lazy
+accessors: together they take over a second to import, and the app
+should start serving (SPA, config, MCP routes) before the first query.
 """
 
+from __future__ import annotations
+
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document as LCDoc
 from langchain_core.messages import AIMessage, HumanMessage
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+from core.clients import get_http_client, make_embeddings, open_vectorstore
 from core.config import CHROMA_DIR, OPENAI_API_KEY
 from core.constants import (
-    EMBEDDING_MODEL,
+    BM25_INDEX_NAME,
+    CONTEXT_SEPARATOR,
     LLM_MODEL,
     LLM_TEMPERATURE,
     MAX_CHAT_HISTORY_LENGTH,
@@ -26,6 +32,10 @@ from core.constants import (
 )
 from core.retrieval import BM25Index
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import ChatOpenAI
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,14 +63,7 @@ class RAGService:
                 raise RuntimeError(
                     "OPENAI_API_KEY not set. Add it to your .env file."
                 )
-            embeddings = OpenAIEmbeddings(
-                model=EMBEDDING_MODEL,
-                openai_api_key=OPENAI_API_KEY,
-            )
-            self._vectorstore = Chroma(
-                persist_directory=str(CHROMA_DIR),
-                embedding_function=embeddings,
-            )
+            self._vectorstore = open_vectorstore(make_embeddings())
         return self._vectorstore
 
     @property
@@ -70,32 +73,32 @@ class RAGService:
                 raise RuntimeError(
                     "OPENAI_API_KEY not set. Add it to your .env file."
                 )
+            from langchain_openai import ChatOpenAI
+
             self._llm = ChatOpenAI(
                 model=LLM_MODEL,
                 temperature=LLM_TEMPERATURE,
                 openai_api_key=OPENAI_API_KEY,
+                http_client=get_http_client(),
             )
         return self._llm
 
     @property
     def bm25_index(self) -> BM25Index | None:
         if self._bm25_index is None:
-            try:
-                all_docs = self.vectorstore.get(
-                    include=["documents", "metadatas"],
-                )
-                if all_docs and all_docs.get("documents"):
-                    docs = [
-                        LCDoc(page_content=content, metadata=meta or {})
-                        for content, meta in zip(
-                            all_docs["documents"], all_docs["metadatas"]
-                        )
-                    ]
-                    self._bm25_index = BM25Index(docs)
-            except Exception:
-                logger.exception("Failed to build BM25 index")
+            self._bm25_index = self._load_or_build_bm25()
         return self._bm25_index
 
+    def _load_or_build_bm25(self) -> BM25Index | None:
+        """Load the persisted BM25 index, rebuilding it if stale or missing."""
+        try:
+            return BM25Index.load_or_build(
+                self.vectorstore, CHROMA_DIR / BM25_INDEX_NAME,
+            )
+        except Exception:
+            logger.exception("Failed to build BM25 index")
+            return None
+
     # -- Chat history -------------------------------------------------------
 
     @property
@@ -103,16 +106,19 @@ class RAGService:
         return self._chat_history
 
     def append_exchange(self, question: str, answer: str) -> None:
-        """Append a user question + assistant answer to the history."""
-        self._chat_history.extend([
-            HumanMessage(content=question),
-            AIMessage(content=answer),
-        ])
-        if len(self._chat_history) > MAX_CHAT_HISTORY_LENGTH:
-            self._chat_history = self._chat_history[-MAX_CHAT_HISTORY_LENGTH:]
+        """Append a user question + assistant answer to the history.
+
+        The list is trimmed in place so callers holding a reference
+        (e.g. a streaming response) keep seeing the live history.
+        """
+        self._chat_history.append(HumanMessage(content=question))
+        self._chat_history.append(AIMessage(content=answer))
+        overflow = len(self._chat_history) - MAX_CHAT_HISTORY_LENGTH
+        if overflow > 0:
+            del self._chat_history[:overflow]
 
     def clear_history(self) -> None:
-        self._chat_history = []
+        self._chat_history.clear()
 
     # -- Helpers ------------------------------------------------------------
 
@@ -121,30 +127,32 @@ class RAGService:
         """Concatenate retrieved documents into a context string."""
         parts: list[str] = []
         for doc in docs:
-            matiere = doc.metadata.get(META_MATIERE, DEFAULT_MATIERE)
-            doc_type = doc.metadata.get(META_DOC_TYPE, DEFAULT_DOC_TYPE)
-            filename = doc.metadata.get(META_FILENAME, "")
+            meta = doc.metadata
             parts.append(
-                f"[{matiere} -- {doc_type} -- {filename}]\n{doc.page_content}"
+                f"[{meta.get(META_MATIERE, DEFAULT_MATIERE)} -- "
+                f"{meta.get(META_DOC_TYPE, DEFAULT_DOC_TYPE)} -- "
+                f"{meta.get(META_FILENAME, '')}]\n{doc.page_content}"
             )
-        return "\n\n---\n\n".join(parts)
+        return CONTEXT_SEPARATOR.join(parts)
 
     @staticmethod
     def deduplicate_sources(docs: list[LCDoc]) -> list[dict[str, str]]:
-        """Build a deduplicated list of source metadata."""
-        sources: list[dict[str, str]] = []
-        seen: set[str] = set()
+        """Build a deduplicated list of source metadata.
+
+        Keyed on filename; the first document seen for a file wins, and
+        dict insertion order keeps the retrieval ranking.
+        """
+        sources: dict[str, dict[str, str]] = {}
         for doc in docs:
-            key = doc.metadata.get(META_FILENAME, "")
-            if key in seen:
-                continue
-            seen.add(key)
-            sources.append({
-                META_MATIERE: doc.metadata.get(META_MATIERE, DEFAULT_MATIERE),
-                META_DOC_TYPE: doc.metadata.get(META_DOC_TYPE, DEFAULT_DOC_TYPE),
-                META_FILENAME: key,
-            })
-        return sources
+            meta = doc.metadata
+            key = meta.get(META_FILENAME, "")
+            if key not in sources:
+                sources[key] = {
+                    META_MATIERE: meta.get(META_MATIERE, DEFAULT_MATIERE),
+                    META_DOC_TYPE: meta.get(META_DOC_TYPE, DEFAULT_DOC_TYPE),
+                    META_FILENAME: key,
+                }
+        return list(sources.values())
 
 
 # Module-level singleton — import this everywhere.
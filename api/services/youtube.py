@@ -175,14 +175,17 @@ class YouTubeService:
         else:
             types_to_run = ["summary"]
 
-        llm = rag_service.llm
-        for atype in types_to_run:
-            try:
-                response = llm.invoke(prompts[atype])
+        # The analyses are independent: send them as one concurrent batch.
+        responses = rag_service.llm.batch(
+            [prompts[atype] for atype in types_to_run],
+            return_exceptions=True,
+        )
+        for atype, response in zip(types_to_run, responses):
+            if isinstance(response, Exception):
+                logger.error("Analysis '%s' failed: %s", atype, response)
+                results[atype] = f"Erreur lors de l'analyse : {response}"
+            else:
                 results[atype] = response.content
-            except Exception as exc:
-                logger.error("Analysis '%s' failed: %s", atype, exc)
-                results[atype] = f"Erreur lors de l'analyse : {exc}"
 
         return results
 
@@ -0,0 +1,106 @@
+"""
+BM25 Numba -- JIT-compiled scoring kernel for ``BM25Index``.
+
+The index stores its postings CSR-style: the postings of term ``t`` are
+``doc_ids[offsets[t]:offsets[t + 1]]`` / ``tfs[...]``.  ``score`` walks
+the postings of every query term in one compiled loop, so a query costs
+a single call from Python whatever its length.
+
+``numba`` is optional: without it ``NUMBA_AVAILABLE`` is False and
+``BM25Index`` scores with NumPy instead.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import threading
+from typing import Callable
+
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# Optional dependency — graceful fallback
+# ---------------------------------------------------------------------------
+
+# Only probed here: importing numba loads LLVM, which the app start and
+# the indexer's loader processes would otherwise pay for.  The kernel is
+# compiled on the first BM25 query that uses it.
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+
+# Postings are scored in blocks of this many entries: a branch-free pass
+# computes the contributions into a small L1-resident buffer (which LLVM
+# can vectorise), then a second pass scatters them into the scores.
+BLOCK_SIZE = 64
+
+
+def _score(
+    term_ids: np.ndarray,
+    weights: np.ndarray,
+    offsets: np.ndarray,
+    doc_ids: np.ndarray,
+    tfs: np.ndarray,
+    len_norm: np.ndarray,
+    allowed: np.ndarray,
+) -> np.ndarray:
+    """Kernel body compiled by ``_get_kernel`` (see ``score``).
+
+    Serial on purpose: query terms share documents, so a prange over
+    terms would race on ``scores[d] +=``, and one posting list is too
+    short to be worth splitting across threads.
+    """
+    scores = np.zeros(len_norm.shape[0], dtype=np.float32)
+    buf = np.empty(BLOCK_SIZE, dtype=np.float32)
+    use_mask = allowed.shape[0] > 0
+    for q in range(term_ids.shape[0]):
+        t = term_ids[q]
+        w = weights[q]
+        end = offsets[t + 1]
+        for start in range(offsets[t], end, BLOCK_SIZE):
+            n = min(BLOCK_SIZE, end - start)
+            for j in range(n):
+                tf = tfs[start + j]
+                buf[j] = w * tf / (tf + len_norm[doc_ids[start + j]])
+            for j in range(n):
+                d = doc_ids[start + j]
+                if use_mask and not allowed[d]:
+                    continue
+                scores[d] += buf[j]
+    return scores
+
+
+_kernel: Callable[..., np.ndarray] | None = None
+_kernel_lock = threading.Lock()
+
+
+def _get_kernel() -> Callable[..., np.ndarray]:
+    """Return the compiled ``_score`` (numba imported on first use)."""
+    global _kernel
+    if _kernel is None:
+        with _kernel_lock:
+            if _kernel is None:
+                import numba
+
+                _kernel = numba.njit(cache=True, fastmath=True)(_score)
+    return _kernel
+
+
+def score(
+    term_ids: np.ndarray,
+    weights: np.ndarray,
+    offsets: np.ndarray,
+    doc_ids: np.ndarray,
+    tfs: np.ndarray,
+    len_norm: np.ndarray,
+    allowed: np.ndarray,
+) -> np.ndarray:
+    """BM25 score of every document for the query *term_ids*.
+
+    *weights* is aligned with *term_ids*: ``idf * (k1 + 1)`` times the
+    term's count in the query.  *len_norm* is the per-document
+    denominator term.  *allowed* is a boolean document mask; pass an
+    empty array to score every document.  Requires ``NUMBA_AVAILABLE``.
+    """
+    return _get_kernel()(
+        term_ids, weights, offsets, doc_ids, tfs, len_norm, allowed,
+    )
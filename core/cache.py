@@ -0,0 +1,178 @@
+"""
+Cache -- Memoised LLM results of the retrieval pipeline.
+
+The same (question, chunk) pairs come back across conversations, and
+each one otherwise costs an LLM round-trip in the retrieval pipeline.
+Entries live on disk (``LLM_CACHE_DIR``) when ``diskcache`` is
+installed, so they survive restarts; otherwise in a bounded in-process
+LRU.  Keys include the model and the prompt version, so changing either
+misses instead of serving stale results.
+
+``SemanticCache`` additionally matches near-identical questions by
+embedding similarity, for results that only depend on the question
+(query rewriting).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import xxhash
+
+from core.config import LLM_CACHE_DIR
+from core.constants import (
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_SIZE_LIMIT,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Optional dependency — graceful fallback
+# ---------------------------------------------------------------------------
+
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+
+class LLMResultCache:
+    """Thread-safe key/value cache with a disk or in-memory LRU backend."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._disk: Any = None
+        if DISKCACHE_AVAILABLE:
+            try:
+                self._disk = diskcache.Cache(
+                    str(LLM_CACHE_DIR),
+                    size_limit=LLM_CACHE_SIZE_LIMIT,
+                )
+            except Exception:
+                logger.warning("diskcache unavailable, using in-memory LLM cache")
+
+    @staticmethod
+    def make_key(kind: str, model: str, question: str, passage: str) -> str:
+        """Digest of (*kind*, *model*, *question*, *passage*).
+
+        *kind* names the call and its prompt version (e.g. ``rerank/v1``),
+        *model* the LLM that answers it.
+        """
+        h = xxhash.xxh64(kind.encode())
+        h.update(b"|")
+        h.update(model.encode())
+        h.update(b"|")
+        h.update(question.encode())
+        h.update(b"|")
+        h.update(passage.encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Any | None:
+        if self._disk is not None:
+            return self._disk.get(key)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self._disk is not None:
+            self._disk.set(key, value)
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+
+
+_llm_cache: LLMResultCache | None = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResultCache:
+    """Return the process-wide LLM result cache (created on first use)."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResultCache()
+    return _llm_cache
+
+
+class SemanticCache:
+    """In-memory nearest-neighbour cache keyed on question embeddings.
+
+    Vectors are L2-normalised into a fixed-size matrix used as a ring
+    buffer, so a lookup is one matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._vectors: np.ndarray | None = None
+        self._values: list[Any] = []
+        self._next = 0
+
+    @staticmethod
+    def _normalise(vector: list[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, vector: list[float]) -> Any | None:
+        """Value stored for the most similar vector above the threshold."""
+        vec = self._normalise(vector)
+        with self._lock:
+            if not self._values:
+                return None
+            sims = self._vectors[:len(self._values)] @ vec
+            best = int(np.argmax(sims))
+            if sims[best] >= self._threshold:
+                return self._values[best]
+        return None
+
+    def set(self, vector: list[float], value: Any) -> None:
+        vec = self._normalise(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self._max_entries, vec.shape[0]), dtype=np.float32
+                )
+            slot = self._next
+            self._vectors[slot] = vec
+            if slot < len(self._values):
+                self._values[slot] = value
+            else:
+                self._values.append(value)
+            self._next = (slot + 1) % self._max_entries
+
+
+_semantic_cache: SemanticCache | None = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic cache (created on first use)."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -0,0 +1,129 @@
+"""
+Clients -- Shared HTTP connection pool and factories for OpenAI-backed
+LangChain clients.
+
+``OpenAIEmbeddings`` and ``ChatOpenAI`` each open their own ``httpx``
+pool by default.  Passing the same client to both keeps TCP + TLS
+connections warm across retrieval, generation and embedding calls.
+
+The app, the indexer and the evaluator must embed with the exact same
+model / dimensions as the persisted index, so the vector store and its
+embeddings are built here rather than at each call site.  The collection
+records both, and ``open_vectorstore`` refuses an index built with other
+settings.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any
+
+import httpx
+
+from core.config import CHROMA_DIR, OPENAI_API_KEY
+from core.exceptions import IndexationError
+from core.constants import (
+    CHROMA_DISTANCE,
+    CHROMA_META_EMBEDDING_DIMENSIONS,
+    CHROMA_META_EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+)
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+_http_client: httpx.Client | None = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled ``httpx.Client`` (created on first use)."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    ),
+                    timeout=httpx.Timeout(HTTP_TIMEOUT),
+                )
+    return _http_client
+
+
+def make_embeddings(**kwargs: Any) -> OpenAIEmbeddings:
+    """Index embeddings (model, dimensions, pooled client); *kwargs* override."""
+    from langchain_openai import OpenAIEmbeddings
+
+    params: dict[str, Any] = {
+        "model": EMBEDDING_MODEL,
+        "dimensions": EMBEDDING_DIMENSIONS,
+        "openai_api_key": OPENAI_API_KEY,
+        "http_client": get_http_client(),
+    }
+    params.update(kwargs)
+    return OpenAIEmbeddings(**params)
+
+
+def _check_collection(collection: Any, model: str, dimensions: int) -> None:
+    """Raise ``IndexationError`` if *collection* was embedded otherwise.
+
+    Collections created before the model / dimensions were recorded in
+    their metadata are checked against the size of a stored vector.
+    """
+    meta = collection.metadata or {}
+    stored_model = meta.get(CHROMA_META_EMBEDDING_MODEL)
+    stored_dimensions = meta.get(CHROMA_META_EMBEDDING_DIMENSIONS)
+    if stored_dimensions is None:
+        sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+        if sample is not None and len(sample):
+            stored_dimensions = len(sample[0])
+    if (stored_model not in (None, model)
+            or stored_dimensions not in (None, dimensions)):
+        raise IndexationError(
+            f"L'index {CHROMA_DIR} a ete construit avec {stored_model or '?'} "
+            f"({stored_dimensions or '?'} dimensions), la configuration utilise "
+            f"{model} ({dimensions} dimensions). "
+            "Reconstruisez-le : python -m scripts.index --force"
+        )
+
+
+def open_vectorstore(embeddings: OpenAIEmbeddings) -> Chroma:
+    """Open (or create) the persisted Chroma collection.
+
+    A new collection records the embedding model and dimensions in its
+    metadata; an existing one built with other settings raises
+    ``IndexationError`` (a full reindex is needed) instead of failing
+    later with a Chroma dimension error.  The distance metric also only
+    takes effect when the collection is created.
+    """
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    model = getattr(embeddings, "model", None) or EMBEDDING_MODEL
+    dimensions = getattr(embeddings, "dimensions", None) or EMBEDDING_DIMENSIONS
+    client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+    try:
+        collection = client.get_collection(
+            Chroma._LANGCHAIN_DEFAULT_COLLECTION_NAME, embedding_function=None,
+        )
+    except Exception:
+        collection = None  # not created yet
+    if collection is not None:
+        _check_collection(collection, model, dimensions)
+
+    return Chroma(
+        client=client,
+        embedding_function=embeddings,
+        collection_metadata={
+            "hnsw:space": CHROMA_DISTANCE,
+            CHROMA_META_EMBEDDING_MODEL: model,
+            CHROMA_META_EMBEDDING_DIMENSIONS: dimensions,
+        },
+    )
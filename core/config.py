@@ -59,13 +59,18 @@ CONFIG: dict = load_config()
 COURSES_DIR: Path = PROJECT_ROOT / CONFIG["courses_dir"]
 CHROMA_DIR: Path = PROJECT_ROOT / CONFIG["chroma_dir"]
 EVAL_RESULTS_DIR: Path = PROJECT_ROOT / "eval_results"
+# Outside CHROMA_DIR, which a full reindex deletes.
+LLM_CACHE_DIR: Path = PROJECT_ROOT / ".llm_cache"
 
 CHUNK_SIZE: int = CONFIG["chunk_size"]
 CHUNK_OVERLAP: int = CONFIG["chunk_overlap"]
 BATCH_SIZE: int = CONFIG["batch_size"]
 MAX_RETRIES: int = CONFIG["max_retries"]
+EMBEDDING_CONCURRENCY: int = CONFIG.get("embedding_concurrency", 10)
 MIN_PAGE_LENGTH: int = CONFIG["min_page_length"]
 MIN_LINE_LENGTH: int = CONFIG["min_line_length"]
 SUPPORTED_EXTENSIONS: set[str] = set(CONFIG["supported_extensions"])
 EXCLUDED_PATTERNS: list[str] = CONFIG["excluded_patterns"]
 SUBJECT_NAMES: dict[str, str] = CONFIG["subject_names"]
+RERANK_BACKEND: str = CONFIG.get("rerank_backend", "llm")
+SEMANTIC_CACHE: bool = CONFIG.get("semantic_cache", True)
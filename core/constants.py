@@ -13,6 +13,18 @@ LLM_TEMPERATURE: float = 0.1
 LLM_JUDGE_TEMPERATURE: float = 0.0
 
 EMBEDDING_MODEL: str = "text-embedding-3-small"
+# Matryoshka truncation of text-embedding-3-* (native size 1536 for -small).
+# Changing either value requires a full reindex: python -m scripts.index --force
+EMBEDDING_DIMENSIONS: int = 1024
+CHROMA_DISTANCE: str = "cosine"
+# Collection metadata recording what the index was embedded with
+CHROMA_META_EMBEDDING_MODEL: str = "embedding_model"
+CHROMA_META_EMBEDDING_DIMENSIONS: str = "embedding_dimensions"
+
+# Shared httpx pool (see core/clients.py)
+HTTP_MAX_CONNECTIONS: int = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+HTTP_TIMEOUT: float = 60.0
 
 # ---------------------------------------------------------------------------
 # Copilot Models
@@ -37,7 +49,10 @@ META_DOC_TYPE: str = "doc_type"
 META_FILENAME: str = "filename"
 META_FILEPATH: str = "filepath"
 META_FILE_HASH: str = "file_hash"
+META_FILE_SIZE: str = "file_size"
+META_FILE_MTIME: str = "file_mtime_ns"
 META_COMPRESSED: str = "compressed"
+META_CHUNK_ID: str = "chunk_id"
 
 # ---------------------------------------------------------------------------
 # Default Metadata Values
@@ -69,6 +84,7 @@ CORRECTION_KEYWORDS: tuple[str, ...] = ("corr", "cor", "solution")
 
 BM25_K1: float = 1.5
 BM25_B: float = 0.75
+BM25_SEARCH_WORKERS: int = 4
 RRF_CONSTANT: int = 60
 
 SEMANTIC_WEIGHT: float = 0.6
@@ -82,7 +98,19 @@ COMPRESS_MAX_CONTENT: int = 3000
 COMPRESS_NON_PERTINENT: str = "NON_PERTINENT"
 COMPRESS_MIN_RESULT_LENGTH: int = 30
 RERANK_MAX_PASSAGE_LENGTH: int = 1500
+RERANK_BACKEND_CROSS_ENCODER: str = "cross_encoder"
+RERANK_CROSS_ENCODER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CROSS_ENCODER_MAX_LENGTH: int = 512
+RERANK_CROSS_ENCODER_BATCH_SIZE: int = 32
 REWRITE_MAX_CONTEXT: int = 1000
+LLM_BATCH_MAX_CONCURRENCY: int = 8
+
+LLM_CACHE_MAX_ENTRIES: int = 4096
+LLM_CACHE_SIZE_LIMIT: int = 2 * 1024 ** 3
+SEMANTIC_CACHE_THRESHOLD: float = 0.97
+SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
+
+CONTEXT_SEPARATOR: str = "\n\n---\n\n"
 
 DEFAULT_NB_SOURCES: int = 10
 MIN_NB_SOURCES: int = 1
@@ -126,16 +154,33 @@ EVAL_WEIGHT_KEYWORD_HIT: float = 0.05
 
 EVAL_LATEST_FILENAME: str = "eval_latest.json"
 EVAL_HISTORY_GLOB: str = "eval_2*.json"
-EVAL_MAX_CONTEXT_LENGTH: int = 10_000
-EVAL_MAX_ANSWER_LENGTH: int = 3_000
-EVAL_MAX_ANSWER_JUDGE: int = 2_000
+EVAL_JUDGE_CACHE_FILENAME: str = ".judge_cache.db"
+EVAL_EMBED_CACHE_FILENAME: str = ".embed_cache.npz"
+EVAL_MAX_WORKERS: int = 8  # questions evaluated concurrently
+# Which judge scored a result (saved with it).  Runs saved without one
+# were scored by the separate prompts.
+EVAL_JUDGE_COMBINED: str = "combined-v1"
+EVAL_JUDGE_SEPARATE: str = "separate-v1"
+EVAL_BATCH_ENDPOINT: str = "/v1/chat/completions"
+EVAL_BATCH_COMPLETION_WINDOW: str = "24h"
+EVAL_BATCH_POLL_SECONDS: int = 30
+# Judge input caps, in tokens (roughly the former 10k / 3k / 2k char caps)
+EVAL_MAX_CONTEXT_TOKENS: int = 2_500
+EVAL_MAX_ANSWER_TOKENS: int = 750
+EVAL_MAX_ANSWER_JUDGE_TOKENS: int = 500
+EVAL_MAX_EXPECTED_TOKENS: int = 400
+EVAL_CHARS_PER_TOKEN: int = 4
 EVAL_MAX_EMBED_LENGTH: int = 2_000
+EVAL_EMBEDDING_DIMENSIONS: int = 512
 
 # ---------------------------------------------------------------------------
 # Indexer
 # ---------------------------------------------------------------------------
 
-FILE_HASH_CHUNK_SIZE: int = 8192
+FILE_HASH_CHUNK_SIZE: int = 1 << 20
+FILE_MANIFEST_NAME: str = "file_hashes.json"
+TREE_MANIFEST_NAME: str = "manifest.xxh64"
+BM25_INDEX_NAME: str = "bm25_index"
 
 # ---------------------------------------------------------------------------
 # Subjects (derived from config at import time — canonical list)
@@ -193,7 +238,7 @@ TOOL_LABELS: dict[str, str] = {
 # System Prompt (shared between app.py, web_app.py, evaluation)
 # ---------------------------------------------------------------------------
 
-SYSTEM_PROMPT: str = """\
+SYSTEM_INSTRUCTIONS: str = """\
 Tu es un assistant pedagogique expert pour un etudiant en Master 1 Informatique
 a l'Universite de Bourgogne. Tu reponds en francais de maniere claire,
 structuree et pedagogique.
@@ -211,11 +256,12 @@ Regles :
 6. Pour les exercices : guide etape par etape (methode socratique).
 7. Fais des liens entre matieres quand c'est pertinent.
 8. Termine par 1-2 questions pour approfondir.
-
-Contexte des cours (extraits indexes) :
-{context}
 """
 
+# Kept out of SYSTEM_INSTRUCTIONS so the system message is byte-identical
+# on every turn (provider prompt caching matches on the prompt prefix).
+CONTEXT_HEADER: str = "Contexte des cours (extraits indexes) :\n"
+
 # ---------------------------------------------------------------------------
 # French Stop Words (for BM25 tokenisation)
 # ---------------------------------------------------------------------------
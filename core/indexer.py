@@ -3,26 +3,32 @@ Indexer -- Ingest Master 1 course documents into a ChromaDB vector store.
 
 Supports PDF, TXT and CSV files.  Handles large volumes through batch
 embedding with automatic retry on rate-limit errors.
-Incremental reindexing with MD5 hash tracking.
+Incremental reindexing with size/mtime + xxh64 change detection.
 """
 
+import asyncio
+import itertools
 import logging
 import os
+import random
 import sys
-import time
 import shutil
-import hashlib
-import fnmatch
 from pathlib import Path
-from collections import Counter
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
+import xxhash
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+)
 
 logger = logging.getLogger(__name__)
 
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-
+from core.clients import make_embeddings, open_vectorstore
 from core.config import (
     OPENAI_API_KEY,
     CONFIG,
@@ -32,19 +38,23 @@ from core.config import (
     CHUNK_OVERLAP,
     BATCH_SIZE,
     MAX_RETRIES,
+    EMBEDDING_CONCURRENCY,
     MIN_PAGE_LENGTH,
     MIN_LINE_LENGTH,
     SUPPORTED_EXTENSIONS,
-    EXCLUDED_PATTERNS,
     SUBJECT_NAMES,
 )
 from core.constants import (
     EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
     META_MATIERE,
     META_DOC_TYPE,
     META_FILENAME,
     META_FILEPATH,
     META_FILE_HASH,
+    META_FILE_SIZE,
+    META_FILE_MTIME,
+    META_CHUNK_ID,
     DOC_TYPE_CM,
     DOC_TYPE_TD,
     DOC_TYPE_TP,
@@ -56,7 +66,12 @@ from core.constants import (
     DEFAULT_DOC_TYPE,
     DEFAULT_MATIERE,
     FILE_HASH_CHUNK_SIZE,
+    FILE_MANIFEST_NAME,
+    TREE_MANIFEST_NAME,
+    BM25_INDEX_NAME,
 )
+from core.paths import is_excluded
+from core.retrieval import BM25Index
 
 # Filename keywords -> document type classification (from constants)
 
@@ -66,13 +81,17 @@ from core.constants import (
 
 
 def compute_file_hash(filepath: str) -> str:
-    """Compute SHA-256 hash of a file for change detection."""
-    sha256_hash = hashlib.sha256()
+    """Compute the xxh64 hash of a file for change detection.
+
+    Non-cryptographic: we only need to notice edits, and xxh64 streams
+    an order of magnitude faster than MD5/SHA-256.
+    """
+    h = xxhash.xxh64()
     try:
         with open(filepath, "rb") as f:
             for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_SIZE), b""):
-                sha256_hash.update(chunk)
-        return sha256_hash.hexdigest()
+                h.update(chunk)
+        return h.hexdigest()
     except Exception:
         logger.warning("Failed to hash file: %s", filepath)
         return ""
@@ -80,33 +99,86 @@ def compute_file_hash(filepath: str) -> str:
 
 def should_exclude_path(filepath: str, base_dir: Path) -> bool:
     """Check if a file path matches any excluded pattern."""
-    rel_path = os.path.relpath(filepath, base_dir)
-    for pattern in EXCLUDED_PATTERNS:
-        if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(os.path.basename(filepath), pattern):
-            return True
-    return False
+    return is_excluded(os.path.relpath(filepath, base_dir))
 
 
-def get_existing_file_hashes(vectorstore) -> dict[str, str]:
-    """Retrieve all file hashes from existing ChromaDB metadata.
+def get_existing_file_states(vectorstore) -> dict[str, tuple[int, int, str]]:
+    """Retrieve the indexed state of every file from ChromaDB metadata.
 
-    Returns a dict mapping filepath -> md5_hash.
+    Returns a dict mapping filepath -> (size, mtime_ns, xxh64).  Chunks
+    indexed before size/mtime were stored get ``-1`` for both, which
+    forces a hash comparison on the next run.
     """
     try:
         all_docs = vectorstore.get(include=["metadatas"])
         if not all_docs or not all_docs.get("metadatas"):
             return {}
 
-        file_hashes = {}
+        file_states = {}
         for meta in all_docs["metadatas"]:
             if meta and META_FILEPATH in meta and META_FILE_HASH in meta:
-                file_hashes[meta[META_FILEPATH]] = meta[META_FILE_HASH]
+                file_states[meta[META_FILEPATH]] = (
+                    meta.get(META_FILE_SIZE, -1),
+                    meta.get(META_FILE_MTIME, -1),
+                    meta[META_FILE_HASH],
+                )
 
-        return file_hashes
+        return file_states
     except Exception:
         return {}
 
 
+def load_file_manifest() -> dict[str, tuple[int, int, str]] | None:
+    """Read the per-file state manifest written by the last indexation.
+
+    Returns ``None`` when the manifest is missing or unreadable so the
+    caller can fall back to ``get_existing_file_states``.
+    """
+    try:
+        data = orjson.loads((CHROMA_DIR / FILE_MANIFEST_NAME).read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return {filepath: tuple(state) for filepath, state in data.items()}
+
+
+def save_file_manifest(file_states: dict[str, tuple[int, int, str]] | None) -> None:
+    """Write the manifest, or remove it when *file_states* is ``None``."""
+    path = CHROMA_DIR / FILE_MANIFEST_NAME
+    if file_states is None:
+        path.unlink(missing_ok=True)
+        return
+    path.write_bytes(orjson.dumps(file_states))
+
+
+def compute_tree_manifest(base_dir: Path | None = None) -> str:
+    """xxh64 over the sorted ``(path, size, mtime_ns)`` of every indexable file.
+
+    Only ``stat`` is called, no file is opened: if the digest matches the
+    one stored by the last run, nothing under *base_dir* has changed.
+    The embedding model and dimensions are hashed in too, so changing
+    them never short-circuits as "up to date".
+    """
+    base_dir = base_dir or COURSES_DIR
+    entries: list[tuple[str, int, int]] = []
+    for root, _, files in os.walk(base_dir):
+        for filename in files:
+            if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            filepath = os.path.join(root, filename)
+            if should_exclude_path(filepath, base_dir):
+                continue
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue
+            entries.append((filepath, st.st_size, st.st_mtime_ns))
+
+    h = xxhash.xxh64(f"{EMBEDDING_MODEL}\0{EMBEDDING_DIMENSIONS}\n".encode())
+    for filepath, size, mtime_ns in sorted(entries):
+        h.update(f"{filepath}\0{size}\0{mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
 def get_subject(filepath: str) -> str:
     """Derive the subject label from the file's position under COURSES_DIR."""
     rel = os.path.relpath(filepath, COURSES_DIR)
@@ -130,26 +202,88 @@ def get_doc_type(filename: str) -> str:
     return DEFAULT_DOC_TYPE
 
 
-def load_all_documents(
-    incremental: bool = False,
-    existing_hashes: dict | None = None,
-) -> tuple[list, set[str], set[str]]:
-    """Walk COURSES_DIR and load every supported file into LangChain documents.
+def _load_one(
+    filepath: str,
+    filename: str,
+    ext: str,
+    previous_state: tuple[int, int, str] | None,
+    incremental: bool,
+) -> tuple[list | None, str, tuple[int, int, str] | None]:
+    """Hash, load and clean a single file (runs in a worker process).
 
-    Args:
-        incremental: If True, only load modified/new files.
-        existing_hashes: Dict mapping filepath -> md5_hash from existing index.
+    Only primitives are passed in so the call pickles cheaply.  Returns
+    ``(docs, filepath, state)`` where *state* is the file's current
+    ``(size, mtime_ns, xxh64)``.  ``docs`` is ``None`` when the file is
+    unchanged in incremental mode; *state* is ``None`` when the file
+    could not be read.
 
-    Returns:
-        Tuple of (documents, filepaths_processed, filepaths_all_current)
+    Change detection is tiered: an unchanged ``(size, mtime_ns)`` skips
+    the file without opening it; otherwise the content hash decides.
     """
-    if existing_hashes is None:
-        existing_hashes = {}
+    from langchain_community.document_loaders import PyMuPDFLoader, TextLoader
 
-    docs: list = []
-    filepaths_processed: set[str] = set()
-    filepaths_all_current: set[str] = set()
-    
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        logger.warning("Failed to stat file: %s", filepath)
+        return None, filepath, None
+    if (
+        incremental
+        and previous_state is not None
+        and previous_state[:2] == (st.st_size, st.st_mtime_ns)
+    ):
+        return None, filepath, previous_state
+
+    current_hash = compute_file_hash(filepath)
+    if not current_hash:
+        return None, filepath, None
+    state = (st.st_size, st.st_mtime_ns, current_hash)
+    if (
+        incremental
+        and previous_state is not None
+        and previous_state[2] == current_hash
+    ):
+        # Touched but unchanged: the new size/mtime skip the hash next time.
+        return None, filepath, state
+
+    try:
+        if ext == ".pdf":
+            loaded = PyMuPDFLoader(filepath).load()
+        else:
+            loaded = TextLoader(filepath, encoding="utf-8").load()
+    except Exception as exc:
+        logger.error("Error loading %s: %s", filename, exc)
+        return None, filepath, None
+
+    subject = get_subject(filepath)
+    doc_type = get_doc_type(filename)
+    for doc in loaded:
+        lines = [
+            line
+            for line in doc.page_content.split("\n")
+            if len(line.strip()) > MIN_LINE_LENGTH
+        ]
+        doc.page_content = "\n".join(lines)
+        doc.metadata.update({
+            META_MATIERE: subject,
+            META_DOC_TYPE: doc_type,
+            META_FILENAME: filename,
+            META_FILEPATH: filepath,
+            META_FILE_HASH: current_hash,
+            META_FILE_SIZE: st.st_size,
+            META_FILE_MTIME: st.st_mtime_ns,
+        })
+
+    docs = [
+        doc for doc in loaded
+        if len(doc.page_content.strip()) > MIN_PAGE_LENGTH
+    ]
+    return docs, filepath, state
+
+
+def _walk_candidates() -> list[tuple[str, str, str]]:
+    """Return ``(filepath, filename, ext)`` for every indexable file."""
+    candidates: list[tuple[str, str, str]] = []
     total_files = 0
     skipped_files = 0
 
@@ -166,62 +300,103 @@ def load_all_documents(
                 skipped_files += 1
                 continue
 
-            filepaths_all_current.add(filepath)
+            candidates.append((filepath, filename, ext))
 
-            current_hash = compute_file_hash(filepath)
-            if not current_hash:
-                continue
+    if total_files > 0:
+        logger.info(
+            "Total files found: %d, Excluded: %d", total_files, skipped_files,
+        )
+    return candidates
 
-            if incremental and filepath in existing_hashes:
-                if existing_hashes[filepath] == current_hash:
-                    continue
-                else:
-                    print(f"  [MODIFIE] {filename}")
 
-            subject = get_subject(filepath)
-            doc_type = get_doc_type(filename)
+def iter_loaded_files(
+    candidates: list[tuple[str, str, str]],
+    incremental: bool = False,
+    existing_states: dict | None = None,
+    file_states: dict | None = None,
+) -> Iterator[tuple[str, list]]:
+    """Yield ``(filepath, documents)`` for each new or modified file.
+
+    Files are parsed in a process pool (PDF extraction is CPU-bound and
+    independent per file) and yielded in walk order.  At most
+    ``2 * workers`` files are in flight, so a slow consumer (embedding)
+    does not let parsed pages pile up in memory.
+
+    When given, *file_states* receives the current ``(size, mtime_ns,
+    xxh64)`` of every file read successfully, loaded or unchanged; a
+    candidate missing from it once the generator is exhausted failed to
+    hash or load.
+    """
+    if existing_states is None:
+        existing_states = {}
+    if not candidates:
+        return
+
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        def submit(candidate: tuple[str, str, str]):
+            filepath, filename, ext = candidate
+            return ex.submit(
+                _load_one, filepath, filename, ext,
+                existing_states.get(filepath), incremental,
+            )
 
+        remaining = iter(candidates)
+        pending = deque(
+            (c, submit(c)) for c in itertools.islice(remaining, 2 * workers)
+        )
+        while pending:
+            (_, filename, _), future = pending.popleft()
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending.append((nxt, submit(nxt)))
+
+            loaded, filepath, state = future.result()
+            if state is not None and file_states is not None:
+                file_states[filepath] = state
+            if loaded is None:
+                continue
             if not incremental:
-                print(f"  [{subject}] {filename}")
-            elif filepath not in existing_hashes:
+                print(f"  [{get_subject(filepath)}] {filename}")
+            elif filepath in existing_states:
+                print(f"  [MODIFIE] {filename}")
+            else:
                 print(f"  [NOUVEAU] {filename}")
+            yield filepath, loaded
 
-            try:
-                if ext == ".pdf":
-                    loaded = PyPDFLoader(filepath).load()
-                else:
-                    loaded = TextLoader(filepath, encoding="utf-8").load()
-
-                for doc in loaded:
-                    lines = [
-                        line
-                        for line in doc.page_content.split("\n")
-                        if len(line.strip()) > MIN_LINE_LENGTH
-                    ]
-                    doc.page_content = "\n".join(lines)
-                    doc.metadata.update({
-                        META_MATIERE: subject,
-                        META_DOC_TYPE: doc_type,
-                        META_FILENAME: filename,
-                        META_FILEPATH: filepath,
-                        META_FILE_HASH: current_hash,
-                    })
-
-                docs.extend(
-                    doc for doc in loaded
-                    if len(doc.page_content.strip()) > MIN_PAGE_LENGTH
-                )
-                filepaths_processed.add(filepath)
-            except Exception as exc:
-                logger.error("Error loading %s: %s", filename, exc)
 
-    if total_files > 0:
-        logger.info(
-            "Total files found: %d, Excluded: %d, Loaded: %d",
-            total_files, skipped_files, len(filepaths_processed),
-        )
-    
-    return docs, filepaths_processed, filepaths_all_current
+def load_all_documents(
+    incremental: bool = False,
+    existing_states: dict | None = None,
+) -> tuple[list, set[str], set[str]]:
+    """Walk COURSES_DIR and load every supported file into LangChain documents.
+
+    Materialises ``iter_loaded_files``; ``main`` streams it instead.
+
+    Args:
+        incremental: If True, only load modified/new files.
+        existing_states: Dict mapping filepath -> (size, mtime_ns, xxh64)
+            from the existing index.
+
+    Returns:
+        Tuple of (documents, filepaths_processed, filepaths_all_current)
+    """
+    candidates = _walk_candidates()
+    docs: list = []
+    filepaths_processed: set[str] = set()
+    for filepath, loaded in iter_loaded_files(
+        candidates, incremental, existing_states,
+    ):
+        docs.extend(loaded)
+        filepaths_processed.add(filepath)
+    return docs, filepaths_processed, {c[0] for c in candidates}
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    """Group *items* into lists of *size* (the last one may be shorter)."""
+    it = iter(items)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
 
 
 # ---------------------------------------------------------------------------
@@ -230,19 +405,19 @@ def load_all_documents(
 
 
 def delete_documents_by_filepath(vectorstore, filepaths: set[str]) -> int:
-    """Delete all documents matching the given filepaths from ChromaDB."""
+    """Delete all documents matching the given filepaths from ChromaDB.
+
+    The filepath filter runs inside Chroma; only the matching ids come
+    back to Python.
+    """
     if not filepaths:
         return 0
     try:
-        all_docs = vectorstore.get(include=["metadatas"])
-        if not all_docs or not all_docs.get("ids"):
-            return 0
-
-        ids_to_delete = []
-        for doc_id, meta in zip(all_docs["ids"], all_docs["metadatas"]):
-            if meta and meta.get(META_FILEPATH) in filepaths:
-                ids_to_delete.append(doc_id)
-
+        matches = vectorstore.get(
+            where={META_FILEPATH: {"$in": sorted(filepaths)}},
+            include=[],
+        )
+        ids_to_delete = matches.get("ids") if matches else None
         if ids_to_delete:
             vectorstore.delete(ids=ids_to_delete)
             return len(ids_to_delete)
@@ -252,6 +427,129 @@ def delete_documents_by_filepath(vectorstore, filepaths: set[str]) -> int:
         return 0
 
 
+def delete_stale_chunks(vectorstore, current_hashes: dict[str, str]) -> int:
+    """Delete the chunks of reindexed files left over from older versions.
+
+    *current_hashes* maps each reindexed filepath to its new xxh64; its
+    chunks stamped with any other hash are removed.  Runs once the new
+    chunks are in, so no batch is being added concurrently.
+    """
+    if not current_hashes:
+        return 0
+    try:
+        matches = vectorstore.get(
+            where={META_FILEPATH: {"$in": sorted(current_hashes)}},
+            include=["metadatas"],
+        )
+        if not matches or not matches.get("ids"):
+            return 0
+        ids_to_delete = [
+            chunk_id
+            for chunk_id, meta in zip(matches["ids"], matches["metadatas"])
+            if meta.get(META_FILE_HASH) != current_hashes[meta[META_FILEPATH]]
+        ]
+        if ids_to_delete:
+            vectorstore.delete(ids=ids_to_delete)
+        return len(ids_to_delete)
+    except Exception as exc:
+        logger.error("Error deleting stale chunks: %s", exc)
+        return 0
+
+
+# ---------------------------------------------------------------------------
+# Embedding
+# ---------------------------------------------------------------------------
+
+
+def _rate_limit_wait(retry_state) -> float:
+    """Seconds to wait before retrying a rate-limited batch.
+
+    Honours OpenAI's ``retry-after-ms`` / ``retry-after`` headers when
+    present; otherwise exponential backoff with random jitter so that
+    concurrent batches do not all wake up at the same instant.
+    """
+    attempt = retry_state.attempt_number
+    exc = retry_state.outcome.exception()
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    wait = None
+    try:
+        if headers.get("retry-after-ms"):
+            wait = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            wait = float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form, fall back to backoff
+    if wait is None:
+        wait = min(2 ** attempt, 60) + random.uniform(0, 2 ** attempt)
+    logger.warning(
+        "Rate limited (attempt %d/%d), retrying in %.1fs",
+        attempt, MAX_RETRIES, wait,
+    )
+    return wait
+
+
+async def add_batches_concurrently(
+    vectorstore,
+    batches: Iterable[list],
+    concurrency: int = EMBEDDING_CONCURRENCY,
+) -> int:
+    """Embed and add *batches* with at most *concurrency* requests in flight.
+
+    *batches* may be a lazy iterable: the next batch is only produced
+    (in a worker thread, since loading / splitting blocks) once a slot
+    frees up, so at most *concurrency* batches are held in memory.
+
+    Rate-limit errors are retried (see ``_rate_limit_wait``); any other
+    error fails the batch at once instead of burning the retry budget on
+    a permanent failure.  A failed batch is reported and skipped.
+    Returns the number of failed batches.
+    """
+    import openai
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    @retry(
+        retry=retry_if_exception_type(openai.RateLimitError),
+        stop=stop_after_attempt(MAX_RETRIES),
+        wait=_rate_limit_wait,
+        reraise=True,
+    )
+    async def _add(batch: list) -> None:
+        await vectorstore.aadd_documents(batch)
+
+    async def _embed_batch(batch_num: int, batch: list) -> bool:
+        try:
+            await _add(batch)
+        except Exception as exc:
+            print(f"   [FAIL] batch {batch_num}: {exc}")
+            return False
+        finally:
+            semaphore.release()
+        print(f"   [OK] batch {batch_num} ({len(batch)} chunks)")
+        return True
+
+    batch_iter = iter(batches)
+    tasks: list[asyncio.Task] = []
+    try:
+        while True:
+            await semaphore.acquire()
+            batch = await asyncio.to_thread(next, batch_iter, None)
+            if batch is None:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(_embed_batch(len(tasks) + 1, batch)))
+    except BaseException:
+        # The producer failed (e.g. a loader worker raised): cancel the
+        # batches in flight instead of leaving them unawaited.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    results = await asyncio.gather(*tasks)
+    return results.count(False)
+
+
 # ---------------------------------------------------------------------------
 # Main pipeline
 # ---------------------------------------------------------------------------
@@ -262,6 +560,18 @@ def main(incremental: bool = False, force_full: bool = False) -> None:
     if not OPENAI_API_KEY:
         sys.exit("OPENAI_API_KEY not found in .env")
 
+    tree_manifest = compute_tree_manifest()
+    tree_manifest_path = CHROMA_DIR / TREE_MANIFEST_NAME
+    if incremental and not force_full:
+        try:
+            if tree_manifest_path.read_text() == tree_manifest:
+                print("Index a jour.")
+                return
+        except OSError:
+            pass
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     print("=" * 55)
     print("Indexation RAG - Master 1 Informatique")
     print("=" * 55)
@@ -278,40 +588,33 @@ def main(incremental: bool = False, force_full: bool = False) -> None:
         print("\nPas d'index existant, indexation complete...")
         incremental = False
 
-    embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=OPENAI_API_KEY,
-    )
+    # Retries are handled per batch in add_batches_concurrently; the
+    # pooled client keeps connections warm across concurrent batches.
+    embeddings = make_embeddings(max_retries=0)
 
-    existing_hashes = {}
+    existing_states = {}
     vectorstore = None
 
     if incremental:
         print("\nChargement de l'index existant...")
         try:
-            vectorstore = Chroma(
-                persist_directory=str(CHROMA_DIR),
-                embedding_function=embeddings,
+            vectorstore = open_vectorstore(embeddings)
+            manifest = load_file_manifest()
+            existing_states = (
+                manifest if manifest is not None
+                else get_existing_file_states(vectorstore)
             )
-            existing_hashes = get_existing_file_hashes(vectorstore)
-            print(f"  {len(existing_hashes)} fichiers indexes actuellement")
+            print(f"  {len(existing_states)} fichiers indexes actuellement")
         except Exception as exc:
             print(f"  [ERREUR] Impossible de charger l'index: {exc}")
             print("  Indexation complete forcee...")
             incremental = False
 
-    print("\nChargement des documents...")
-    documents, processed_paths, current_paths = load_all_documents(
-        incremental=incremental,
-        existing_hashes=existing_hashes,
-    )
-    print(f"  {len(documents)} pages chargees")
-
-    if not documents and not incremental:
-        sys.exit("Aucun document trouve.")
+    candidates = _walk_candidates()
+    current_paths = {c[0] for c in candidates}
 
-    if incremental and existing_hashes:
-        deleted_paths = set(existing_hashes.keys()) - current_paths
+    if incremental and existing_states:
+        deleted_paths = set(existing_states.keys()) - current_paths
         if deleted_paths:
             print(f"\n{len(deleted_paths)} fichiers supprimes detectes:")
             for path in sorted(deleted_paths):
@@ -319,56 +622,109 @@ def main(incremental: bool = False, force_full: bool = False) -> None:
             deleted_count = delete_documents_by_filepath(vectorstore, deleted_paths)
             print(f"  {deleted_count} chunks supprimes")
 
-    if incremental and not documents:
-        print("\nAucune modification detectee. Index a jour.")
-        return
-
-    print(f"\nDecoupage en chunks ({CHUNK_SIZE} car.)...")
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
         separators=["\n\n", "\n", ". ", " ", ""],
     )
-    chunks = splitter.split_documents(documents)
-    print(f"  {len(chunks)} chunks")
 
-    if incremental and processed_paths:
-        print(f"\nSuppression des anciens chunks pour {len(processed_paths)} fichiers modifies...")
-        deleted_count = delete_documents_by_filepath(vectorstore, processed_paths)
-        print(f"  {deleted_count} chunks supprimes")
+    # Manifest for the next run: the current state of every file read
+    # successfully (filled in by iter_loaded_files).
+    file_states: dict[str, tuple[int, int, str]] = {}
+    reloaded: set[str] = set()
+    chunk_counts: Counter = Counter()
+
+    def chunk_stream() -> Iterator:
+        """files -> pages -> chunks, one file at a time."""
+        for filepath, docs in iter_loaded_files(
+            candidates, incremental, existing_states, file_states,
+        ):
+            # Its old chunks are deleted once the new ones are in (see
+            # remove_stale_chunks): Chroma is not written from here.
+            reloaded.add(filepath)
+            chunks = splitter.split_documents(docs)
+            for chunk in chunks:
+                # Stable key for retrieval-time dedup / fusion, hashed once here.
+                chunk.metadata[META_CHUNK_ID] = xxhash.xxh64_hexdigest(
+                    (chunk.metadata.get(META_FILENAME, "") + "\x00"
+                     + chunk.page_content).encode()
+                )
+            chunk_counts[get_subject(filepath)] += len(chunks)
+            yield from chunks
+
+    def remove_stale_chunks() -> None:
+        """Drop the previous chunks of every modified file (incremental)."""
+        if not incremental:
+            return
+        stale = delete_stale_chunks(vectorstore, {
+            path: file_states[path][2] for path in reloaded
+        })
+        if stale:
+            print(f"  {stale} anciens chunks supprimes")
+
+    def unreadable_files() -> set[str]:
+        """Files that failed to hash or load (once the stream is drained).
+
+        They keep their previous state, so the next incremental run
+        still sees them as changed and retries them.
+        """
+        failed_paths = current_paths - file_states.keys()
+        for path in failed_paths & existing_states.keys():
+            file_states[path] = existing_states[path]
+        if failed_paths:
+            print(f"   {len(failed_paths)} fichier(s) illisible(s)")
+        return failed_paths
+
+    print(f"\nChargement, decoupage ({CHUNK_SIZE} car.) et indexation...")
+    chunks = chunk_stream()
+    first_chunk = next(chunks, None)
+
+    if first_chunk is None:
+        if not incremental:
+            sys.exit("Aucun document trouve.")
+        # Modified files may have no content left.
+        remove_stale_chunks()
+        unreadable = unreadable_files()
+        save_file_manifest(file_states)
+        # Without a tree manifest the next run re-checks every file.
+        if unreadable:
+            tree_manifest_path.unlink(missing_ok=True)
+        else:
+            tree_manifest_path.write_text(tree_manifest)
+        print("\nAucune modification detectee. Index a jour.")
+        return
 
     if not incremental or not index_exists:
         if CHROMA_DIR.exists():
             shutil.rmtree(CHROMA_DIR)
         vectorstore = None
-
-    total_batches = (len(chunks) + BATCH_SIZE - 1) // BATCH_SIZE
-    print(f"\nIndexation ({total_batches} batches de {BATCH_SIZE})...")
-
-    for offset in range(0, len(chunks), BATCH_SIZE):
-        batch = chunks[offset : offset + BATCH_SIZE]
-        batch_num = offset // BATCH_SIZE + 1
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                if vectorstore is None:
-                    vectorstore = Chroma.from_documents(
-                        batch,
-                        embeddings,
-                        persist_directory=str(CHROMA_DIR),
-                    )
-                else:
-                    vectorstore.add_documents(batch)
-                print(f"   [OK] batch {batch_num}/{total_batches}")
-                break
-            except Exception:
-                wait = min(2 ** attempt * 5, 120)
-                print(f"   [WAIT] rate-limit batch {batch_num}, retry in {wait}s")
-                time.sleep(wait)
-        else:
-            print(f"   [FAIL] batch {batch_num}")
-
-        time.sleep(1)
+    if vectorstore is None:
+        vectorstore = open_vectorstore(embeddings)
+
+    print(f"  batches de {BATCH_SIZE}, {EMBEDDING_CONCURRENCY} en parallele")
+    batches = _batched(itertools.chain([first_chunk], chunks), BATCH_SIZE)
+    failed = asyncio.run(add_batches_concurrently(vectorstore, batches))
+    print(f"  {sum(chunk_counts.values())} chunks")
+    if failed:
+        print(f"   {failed} batch(es) en echec")
+    remove_stale_chunks()
+    unreadable = unreadable_files()
+    # A failed batch leaves files partially indexed: drop the manifest so
+    # the next incremental run re-derives state from Chroma metadata.
+    save_file_manifest(None if failed else file_states)
+
+    print("\nConstruction de l'index BM25...")
+    try:
+        bm25_index = BM25Index.from_vectorstore(vectorstore)
+        if bm25_index is not None:
+            bm25_index.save(CHROMA_DIR / BM25_INDEX_NAME)
+            print(f"  {len(bm25_index.documents)} chunks indexes")
+    except Exception as exc:
+        logger.error("BM25 index build failed: %s", exc)
+    if failed or unreadable:
+        tree_manifest_path.unlink(missing_ok=True)
+    else:
+        tree_manifest_path.write_text(tree_manifest)
 
     print("\nPar matiere :")
     try:
@@ -382,8 +738,7 @@ def main(incremental: bool = False, force_full: bool = False) -> None:
             for subject, count in sorted(subject_counts.items()):
                 print(f"   - {subject}: {count}")
     except Exception:
-        subject_counts = Counter(ch.metadata[META_MATIERE] for ch in chunks)
-        for subject, count in sorted(subject_counts.items()):
+        for subject, count in sorted(chunk_counts.items()):
             print(f"   - {subject}: {count}")
 
     mode_str = "incrementale" if incremental else "complete"
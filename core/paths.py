@@ -0,0 +1,34 @@
+"""
+Path exclusion -- shared by the indexer and the watcher.
+
+Kept free of heavy imports so the watcher can check paths without
+loading the indexing stack.
+"""
+
+import fnmatch
+import os
+import re
+
+from core.config import EXCLUDED_PATTERNS
+
+# All excluded patterns in one regex, compiled once rather than per file
+# on every check.  Patterns and paths go through ``os.path.normcase``
+# like ``fnmatch.fnmatch`` does, so matching is case-insensitive where
+# the filesystem is.
+_EXCLUDED_RE = re.compile(
+    "|".join(fnmatch.translate(os.path.normcase(p)) for p in EXCLUDED_PATTERNS)
+    or r"(?!)"
+)
+
+
+def is_excluded(rel_path: str) -> bool:
+    """Check if *rel_path* or any of its components matches an excluded pattern.
+
+    *rel_path* is relative to the courses directory, so a directory
+    pattern (``.git``, ``node_modules``) excludes everything below it.
+    """
+    rel_path = os.path.normcase(rel_path)
+    match = _EXCLUDED_RE.match
+    return bool(match(rel_path)) or any(
+        match(part) for part in rel_path.split(os.sep)
+    )
@@ -0,0 +1,28 @@
+"""
+Prompt assembly shared by the chat endpoint and the evaluator.
+"""
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from core.constants import CONTEXT_HEADER, SYSTEM_INSTRUCTIONS
+
+# Only the static instructions go in the system message; the retrieved
+# context rides with the current question.  The prompt prefix (system +
+# earlier turns) is then identical from one turn to the next, which is
+# what OpenAI's automatic prompt caching keys on.
+_SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_INSTRUCTIONS)
+
+
+def build_messages(
+    context: str,
+    chat_history: list[BaseMessage],
+    question: str,
+) -> list[BaseMessage]:
+    """Assemble [system, *history, human(context + question)] for the LLM."""
+    return [
+        _SYSTEM_MESSAGE,
+        *chat_history,
+        HumanMessage(
+            content=f"{CONTEXT_HEADER}{context}\n\nQuestion : {question}"
+        ),
+    ]
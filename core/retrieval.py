@@ -8,22 +8,43 @@ Provides:
 - Cross-encoder-style LLM re-ranking of retrieved documents
 """
 
+from __future__ import annotations
+
 import re
-import math
-import json
+import os
+import shutil
 import logging
-from collections import Counter
-from typing import Any
+import heapq
+import itertools
+import threading
+import importlib.util
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import orjson
+import xxhash
 
 logger = logging.getLogger(__name__)
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 
+from core import bm25_numba
+from core.bm25_numba import NUMBA_AVAILABLE
+from core.cache import get_llm_cache, get_semantic_cache
+from core.config import RERANK_BACKEND, SEMANTIC_CACHE
 from core.constants import (
+    LLM_MODEL,
     BM25_K1,
     BM25_B,
+    BM25_SEARCH_WORKERS,
     RRF_CONSTANT,
     SEMANTIC_WEIGHT,
     BM25_WEIGHT,
@@ -34,12 +55,36 @@ from core.constants import (
     COMPRESS_NON_PERTINENT,
     COMPRESS_MIN_RESULT_LENGTH,
     RERANK_MAX_PASSAGE_LENGTH,
+    RERANK_BACKEND_CROSS_ENCODER,
+    RERANK_CROSS_ENCODER_MODEL,
+    RERANK_CROSS_ENCODER_MAX_LENGTH,
+    RERANK_CROSS_ENCODER_BATCH_SIZE,
     REWRITE_MAX_CONTEXT,
+    LLM_BATCH_MAX_CONCURRENCY,
     META_FILENAME,
+    META_MATIERE,
     META_COMPRESSED,
+    META_CHUNK_ID,
     STOP_WORDS_FR,
 )
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# ---------------------------------------------------------------------------
+# Optional dependency — graceful fallback
+# ---------------------------------------------------------------------------
+
+# Only probed here: importing sentence_transformers pulls in torch, so the
+# model is loaded on the first rerank that uses it.
+CROSS_ENCODER_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+if RERANK_BACKEND == RERANK_BACKEND_CROSS_ENCODER and not CROSS_ENCODER_AVAILABLE:
+    logger.warning(
+        "rerank_backend is cross_encoder but sentence-transformers is not "
+        "installed -- run: pip install sentence-transformers (using the LLM)"
+    )
+
 # ---------------------------------------------------------------------------
 # 1. Query Rewriting / Expansion
 # ---------------------------------------------------------------------------
@@ -67,37 +112,80 @@ REWRITE_PROMPT = ChatPromptTemplate.from_messages([
     )),
 ])
 
+# Cache kinds carry a prompt version: bump it whenever the prompt above
+# changes, or the LLM cache keeps serving answers to the old prompt.
+_REWRITE_CACHE_KIND = "rewrite/v1"
+
+def _llm_rewrite(
+    question: str,
+    llm: ChatOpenAI,
+    chat_context: str,
+    key: str,
+) -> dict[str, Any] | None:
+    """Ask *llm* for the rewrite and cache it under *key*; None on failure."""
+    try:
+        msgs = REWRITE_PROMPT.invoke({
+            "question": question,
+            "chat_context": chat_context[:REWRITE_MAX_CONTEXT],
+        })
+        response = llm.invoke(msgs)
+        parsed = extract_json(response.content.strip())
+        if parsed is None:
+            return None
+        result = {
+            "rewritten": parsed.get("rewritten", question),
+            "keywords": parsed.get("keywords", []),
+        }
+        get_llm_cache().set(key, result)
+        return result
+    except Exception:
+        logger.warning("Query rewrite failed, using original question")
+        return None
+
 
 def rewrite_query(
     question: str,
     llm: ChatOpenAI,
     chat_context: str = "",
+    embeddings: Any = None,
 ) -> dict[str, Any]:
     """Rewrite a user question for better retrieval.
 
     Returns a dict with 'rewritten' (enriched query) and 'keywords' (list).
     Falls back to original question on any error.
+
+    Rewrites are cached by exact (question, context).  When *embeddings*
+    is given and there is no conversation context, a near-identical
+    earlier question is also reused (``SemanticCache``).  The lookup
+    runs before the LLM is called, so a hit costs one embedding and no
+    completion; a miss pays the embedding on top of the LLM round-trip.
     """
     fallback = {"rewritten": question, "keywords": [], "original": question}
-    try:
-        msgs = REWRITE_PROMPT.invoke({
-            "question": question,
-            "chat_context": chat_context[:REWRITE_MAX_CONTEXT],
-        })
-        response = llm.invoke(msgs)
-        text = response.content.strip()
+    cache = get_llm_cache()
+    key = cache.make_key(_REWRITE_CACHE_KIND, _model_name(llm), question, chat_context)
+    cached = cache.get(key)
+    if cached is not None:
+        return {**cached, "original": question}
 
-        parsed = _extract_json(text)
-        if parsed is not None:
-            return {
-                "rewritten": parsed.get("rewritten", question),
-                "keywords": parsed.get("keywords", []),
-                "original": question,
-            }
+    if embeddings is None or not SEMANTIC_CACHE or chat_context:
+        result = _llm_rewrite(question, llm, chat_context, key)
+        return {**result, "original": question} if result is not None else fallback
+
+    vector = None
+    try:
+        vector = embeddings.embed_query(question)
+        cached = get_semantic_cache().get(vector)
+        if cached is not None:
+            return {**cached, "original": question}
     except Exception:
-        logger.warning("Query rewrite failed, using original question")
+        logger.debug("Semantic cache lookup failed")
 
-    return fallback
+    result = _llm_rewrite(question, llm, chat_context, key)
+    if result is None:
+        return fallback
+    if vector is not None:
+        get_semantic_cache().set(vector, result)
+    return {**result, "original": question}
 
 
 # ---------------------------------------------------------------------------
@@ -105,15 +193,87 @@ def rewrite_query(
 # ---------------------------------------------------------------------------
 
 
+_TOKEN_RE = re.compile(r"[a-zàâäéèêëïîôùûüÿçœæ0-9]+")
+
+
 def _tokenize(text: str) -> list[str]:
     """Simple French-friendly tokeniser."""
-    text = text.lower()
-    tokens = re.findall(r"[a-zàâäéèêëïîôùûüÿçœæ0-9]+", text)
-    return [t for t in tokens if t not in STOP_WORDS_FR and len(t) > 1]
+    return [
+        t for t in _TOKEN_RE.findall(text.lower())
+        if len(t) > 1 and t not in STOP_WORDS_FR
+    ]
+
+
+@lru_cache(maxsize=1024)
+def _tokenize_query(text: str) -> tuple[str, ...]:
+    """``_tokenize`` for query strings, memoised (hashable result).
+
+    Rewritten queries repeat across turns and the evaluator replays the
+    same question set, so the same strings are tokenised again and again.
+    """
+    return tuple(_tokenize(text))
+
+
+def _tokenize_batch(texts: Iterable[str]) -> Iterator[dict[str, int]]:
+    """Term frequencies for many documents (BM25 index build).
+
+    Same tokens as ``_tokenize``, but counted before filtering so the
+    length / stop-word test runs once per distinct term rather than
+    once per occurrence.  Lazy, so only one document's counts are alive
+    at a time during the build.
+    """
+    findall = _TOKEN_RE.findall
+    for text in texts:
+        counts = Counter(findall(text.lower()))
+        yield {
+            t: tf for t, tf in counts.items()
+            if len(t) > 1 and t not in STOP_WORDS_FR
+        }
+
+
+def _corpus_digest(ids: Iterable[str]) -> str:
+    """Order-independent fingerprint of a set of Chroma ids."""
+    h = xxhash.xxh3_64()
+    for chunk_id in sorted(ids):
+        h.update(chunk_id.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class _StoredDocuments(Sequence[Document]):
+    """Read-only document list backed by a saved index's record file.
+
+    Each document is decoded from its orjson record on access, so
+    loading an index does not parse the whole corpus up front.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> Document:  # type: ignore[override]
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        content, meta = orjson.loads(self._blob[start:end].tobytes())
+        return Document(page_content=content, metadata=meta)
 
 
 class BM25Index:
-    """Minimal BM25 index over a list of LangChain documents."""
+    """Minimal BM25 index over a list of LangChain documents.
+
+    Postings are stored CSR-style: term ``t`` (id ``self._vocab[term]``)
+    owns ``self._doc_ids[o[t]:o[t + 1]]`` / ``self._tfs[...]`` with
+    ``o = self._offsets``.  A built index can be persisted with ``save``
+    and rehydrated with ``load`` without re-tokenising the corpus.
+    """
 
     def __init__(
         self,
@@ -124,56 +284,296 @@ class BM25Index:
         self.documents = documents
         self.k1 = k1
         self.b = b
-
-        self._doc_tokens: list[list[str]] = []
-        self._doc_freqs: list[Counter] = []
-        self._idf: dict[str, float] = {}
+        # Fingerprint of the Chroma ids the index was built from (set by
+        # ``from_vectorstore``), used by ``load_or_build`` to spot staleness.
+        self.corpus_digest: str | None = None
 
         n = len(documents)
-        df: Counter = Counter()
-        total_len = 0
-
-        for doc in documents:
-            tokens = _tokenize(doc.page_content)
-            self._doc_tokens.append(tokens)
-            freq = Counter(tokens)
-            self._doc_freqs.append(freq)
-            df.update(freq.keys())
-            total_len += len(tokens)
-
-        self._avgdl = total_len / n if n else 1.0
-
-        for term, doc_count in df.items():
-            self._idf[term] = math.log(
-                (n - doc_count + 0.5) / (doc_count + 0.5) + 1.0
-            )
+        doc_lens = np.zeros(n, dtype=np.float32)
+        # Inverted index, accumulated in compact int32 buffers (4 bytes
+        # per entry instead of a boxed int each) then frozen into flat
+        # arrays.
+        raw_postings: dict[str, tuple[array, array]] = {}
+
+        term_freqs = _tokenize_batch(doc.page_content for doc in documents)
+        for idx, freqs in enumerate(term_freqs):
+            doc_lens[idx] = sum(freqs.values())
+            for term, tf in freqs.items():
+                postings = raw_postings.get(term)
+                if postings is None:
+                    postings = raw_postings[term] = (array("i"), array("i"))
+                postings[0].append(idx)
+                postings[1].append(tf)
+
+        self._doc_lens = doc_lens
+        self._avgdl = float(doc_lens.mean()) if n else 1.0
+
+        self._vocab: dict[str, int] = {
+            term: tid for tid, term in enumerate(raw_postings)
+        }
+        doc_freqs = np.fromiter(
+            (len(ids) for ids, _ in raw_postings.values()),
+            dtype=np.int64, count=len(raw_postings),
+        )
+        self._offsets = np.zeros(len(raw_postings) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=self._offsets[1:])
+        total = int(self._offsets[-1])
+        self._doc_ids = np.fromiter(
+            itertools.chain.from_iterable(ids for ids, _ in raw_postings.values()),
+            dtype=np.int32, count=total,
+        )
+        self._tfs = np.fromiter(
+            itertools.chain.from_iterable(tfs for _, tfs in raw_postings.values()),
+            dtype=np.float32, count=total,
+        )
+        self._idf = np.log((n - doc_freqs + 0.5) / (doc_freqs + 0.5) + 1.0)
+
+        self._precompute_scoring()
+        self._build_subject_index()
+
+    def _precompute_scoring(self) -> None:
+        """Fold every query-independent factor of the BM25 formula.
+
+        ``score = weight[t] * tf / (tf + len_norm[d])`` where
+        ``weight = idf * (k1 + 1)`` and
+        ``len_norm = k1 * (1 - b + b * dl / avgdl)``.
+        """
+        self._len_norm: np.ndarray = (
+            self.k1 * (1 - self.b + self.b * self._doc_lens / self._avgdl)
+        ).astype(np.float32)
+        self._term_weight: np.ndarray = (
+            self._idf * (self.k1 + 1)
+        ).astype(np.float32)
+
+    def _build_subject_index(self) -> None:
+        """Map each subject (``META_MATIERE``) to the ids of its documents."""
+        by_subject: dict[str, list[int]] = {}
+        for idx, doc in enumerate(self.documents):
+            by_subject.setdefault(doc.metadata.get(META_MATIERE, ""), []).append(idx)
+        self._subject_doc_ids: dict[str, np.ndarray] = {
+            subject: np.asarray(ids, dtype=np.int32)
+            for subject, ids in by_subject.items()
+        }
 
-    def query(self, text: str, k: int = 10) -> list[tuple[Document, float]]:
-        """Return the top-*k* documents with BM25 scores for *text*."""
-        query_tokens = _tokenize(text)
-        scores: list[float] = []
-
-        for idx, freq in enumerate(self._doc_freqs):
-            doc_len = len(self._doc_tokens[idx])
-            score = 0.0
-            for qt in query_tokens:
-                if qt not in freq:
-                    continue
-                tf = freq[qt]
-                idf = self._idf.get(qt, 0.0)
-                numerator = tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (
-                    1 - self.b + self.b * doc_len / self._avgdl
-                )
-                score += idf * numerator / denominator
-            scores.append(score)
+    def _allowed_mask(self, filter_dict: dict | None) -> np.ndarray | None:
+        """Boolean document mask for a subject filter, or ``None`` (no filter).
+
+        Understands the filters the app builds: ``{matiere: X}``,
+        ``{matiere: {"$eq": X}}`` and ``{matiere: {"$in": [...]}}``.
+        An empty ``$in`` matches no document.
+        """
+        if not filter_dict or META_MATIERE not in filter_dict:
+            return None
+        cond = filter_dict[META_MATIERE]
+        if isinstance(cond, dict):
+            if "$in" in cond:
+                subjects = cond["$in"]
+            elif "$eq" in cond:
+                subjects = [cond["$eq"]]
+            else:
+                return None
+        else:
+            subjects = [cond]
+
+        mask = np.zeros(len(self.documents), dtype=bool)
+        for subject in subjects:
+            ids = self._subject_doc_ids.get(subject)
+            if ids is not None:
+                mask[ids] = True
+        return mask
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Any) -> BM25Index | None:
+        """Build an index over every chunk in a Chroma vectorstore."""
+        all_docs = vectorstore.get(include=["documents", "metadatas"])
+        if not all_docs or not all_docs.get("documents"):
+            return None
+        index = cls([
+            Document(page_content=content, metadata=meta or {})
+            for content, meta in zip(all_docs["documents"], all_docs["metadatas"])
+        ])
+        index.corpus_digest = _corpus_digest(all_docs["ids"])
+        return index
+
+    # -- Persistence ---------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        """Write the index to the directory *path*.
+
+        Every array is a plain ``.npy`` file so ``load`` can memory-map
+        it.  Documents are stored as concatenated orjson records plus an
+        offsets array, so ``load`` needs neither Chroma nor the tokenizer
+        and parses a document only when a query returns it.  The previous
+        index is swapped out only once the new one is fully written.
+        """
+        tmp_dir = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        subjects = list(self._subject_doc_ids)
+        doc_subject = np.zeros(len(self.documents), dtype=np.int32)
+        for code, subject in enumerate(subjects):
+            doc_subject[self._subject_doc_ids[subject]] = code
+
+        doc_offsets = np.zeros(len(self.documents) + 1, dtype=np.int64)
+        with open(tmp_dir / "documents.bin", "wb") as fh:
+            for i, doc in enumerate(self.documents):
+                record = orjson.dumps([doc.page_content, doc.metadata])
+                fh.write(record)
+                doc_offsets[i + 1] = doc_offsets[i] + len(record)
+
+        arrays = {
+            "doc_lens": self._doc_lens,
+            "doc_subject": doc_subject,
+            "doc_offsets": doc_offsets,
+            "idf": self._idf,
+            "posting_offsets": self._offsets,
+            "posting_doc_ids": self._doc_ids,
+            "posting_tfs": self._tfs,
+        }
+        for name, arr in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(arr))
+        (tmp_dir / "terms.json").write_bytes(orjson.dumps(list(self._vocab)))
+        (tmp_dir / "meta.json").write_bytes(orjson.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "avgdl": self._avgdl,
+            "subjects": subjects,
+            "corpus_digest": self.corpus_digest,
+        }))
+
+        old_dir = path.with_name(path.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old_dir)
+        os.replace(tmp_dir, path)
+        # A running app may still have the old files mapped (fine on
+        # POSIX; on Windows the leftover is removed by the next save).
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path) -> BM25Index:
+        """Open an index written by ``save``, memory-mapping its arrays."""
+        def array(name: str) -> np.ndarray:
+            return np.load(path / f"{name}.npy", mmap_mode="r")
+
+        meta = orjson.loads((path / "meta.json").read_bytes())
+        index = cls.__new__(cls)
+        index.k1 = float(meta["k1"])
+        index.b = float(meta["b"])
+        index._avgdl = float(meta["avgdl"])
+        index.corpus_digest = meta.get("corpus_digest")
+        index._doc_lens = array("doc_lens")
+        index._vocab = {
+            term: tid
+            for tid, term in enumerate(orjson.loads((path / "terms.json").read_bytes()))
+        }
+        index._idf = array("idf")
+        index._offsets = array("posting_offsets")
+        index._doc_ids = array("posting_doc_ids")
+        index._tfs = array("posting_tfs")
+        index.documents = _StoredDocuments(
+            np.memmap(path / "documents.bin", dtype=np.uint8, mode="r")
+            if (path / "documents.bin").stat().st_size
+            else np.empty(0, dtype=np.uint8),
+            array("doc_offsets"),
+        )
+
+        doc_subject = array("doc_subject")
+        index._subject_doc_ids = {
+            subject: np.flatnonzero(doc_subject == code).astype(np.int32)
+            for code, subject in enumerate(meta["subjects"])
+        }
+        index._precompute_scoring()
+        return index
+
+    @classmethod
+    def load_or_build(cls, vectorstore: Any, path: Path) -> BM25Index | None:
+        """Load the index persisted at *path*, rebuilding it if stale or missing.
+
+        Chunks added or replaced outside the indexer (YouTube, Drive,
+        Notion) change the set of Chroma ids; the index is reused only
+        while its ``corpus_digest`` still matches it.
+        """
+        if path.exists():
+            try:
+                index = cls.load(path)
+                ids = vectorstore.get(include=[])["ids"]
+                if index.corpus_digest is not None:
+                    fresh = index.corpus_digest == _corpus_digest(ids)
+                else:
+                    # Saved before digests were recorded.
+                    fresh = len(index.documents) == len(ids)
+                if fresh:
+                    return index
+            except Exception:
+                logger.warning("Unreadable BM25 index at %s, rebuilding", path)
+        index = cls.from_vectorstore(vectorstore)
+        if index is not None:
+            index.save(path)
+        return index
+
+    def query(
+        self,
+        text: str,
+        k: int = 10,
+        filter_dict: dict | None = None,
+    ) -> list[tuple[Document, float]]:
+        """Return the top-*k* documents with BM25 scores for *text*.
+
+        A subject *filter_dict* (same shape as the Chroma filter) restricts
+        scoring to the documents of those subjects.
+        """
+        # A term repeated in the query adds its contribution once per
+        # occurrence: walk each posting list once, weighted by the count.
+        vocab = self._vocab
+        query_counts = Counter(
+            vocab[qt] for qt in _tokenize_query(text) if qt in vocab
+        )
+        if not query_counts:
+            return []
+        term_ids = np.fromiter(query_counts, dtype=np.int64, count=len(query_counts))
+        weights = self._term_weight[term_ids] * np.fromiter(
+            query_counts.values(), dtype=np.float32, count=len(query_counts),
+        )
+        allowed = self._allowed_mask(filter_dict)
+        if allowed is not None and not allowed.any():
+            return []
+
+        # Only documents in a query term's posting list can score > 0.
+        if NUMBA_AVAILABLE:
+            scores = bm25_numba.score(
+                term_ids,
+                weights,
+                self._offsets,
+                self._doc_ids,
+                self._tfs,
+                self._len_norm,
+                allowed if allowed is not None else np.empty(0, dtype=bool),
+            )
+        else:
+            # Every matched posting scored in one vectorised pass, then
+            # summed per document with ``bincount`` (no per-term loop).
+            offsets = self._offsets
+            spans = [slice(offsets[t], offsets[t + 1]) for t in term_ids]
+            doc_ids = np.concatenate([self._doc_ids[s] for s in spans])
+            tfs = np.concatenate([self._tfs[s] for s in spans])
+            weights = np.repeat(weights, [s.stop - s.start for s in spans])
+            if allowed is not None:
+                keep = allowed[doc_ids]
+                doc_ids, tfs, weights = doc_ids[keep], tfs[keep], weights[keep]
+            scores = np.bincount(
+                doc_ids,
+                weights=weights * tfs / (tfs + self._len_norm[doc_ids]),
+                minlength=len(self.documents),
+            )
 
-        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
-        return [
-            (self.documents[i], scores[i])
-            for i in ranked[:k]
-            if scores[i] > 0
-        ]
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            part = np.argpartition(scores[candidates], -k)[-k:]
+            candidates = candidates[part]
+        top = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.documents[i], float(scores[i])) for i in top]
 
 
 # ---------------------------------------------------------------------------
@@ -181,6 +581,12 @@ class BM25Index:
 # ---------------------------------------------------------------------------
 
 
+# Shared by every request: no executor set-up on the query path.
+_SEARCH_POOL = ThreadPoolExecutor(
+    max_workers=BM25_SEARCH_WORKERS, thread_name_prefix="bm25",
+)
+
+
 def hybrid_search(
     query: str,
     vectorstore: Any,
@@ -195,24 +601,20 @@ def hybrid_search(
     if fetch_k is None:
         fetch_k = k * FETCH_K_MULTIPLIER
 
-    search_kwargs: dict[str, Any] = {"k": k, "fetch_k": fetch_k}
-    if filter_dict:
-        search_kwargs["filter"] = filter_dict
+    retriever = _get_mmr_retriever(vectorstore, k, fetch_k, filter_dict)
+    if bm25_index is None:
+        return retriever.invoke(query)
 
-    retriever = vectorstore.as_retriever(
-        search_type=SEARCH_TYPE_MMR,
-        search_kwargs=search_kwargs,
+    # The vector search waits on the embedding API; score BM25 (CPU,
+    # NumPy releases the GIL) on a worker meanwhile.
+    bm25_future = _SEARCH_POOL.submit(
+        bm25_index.query, query, k=k, filter_dict=filter_dict,
     )
     semantic_docs = retriever.invoke(query)
+    bm25_docs = [doc for doc, _ in bm25_future.result()]
 
-    if bm25_index is None:
-        return semantic_docs
-
-    bm25_results = bm25_index.query(query, k=k)
-    bm25_docs = [doc for doc, _ in bm25_results]
-
-    scores: dict[str, float] = {}
-    doc_map: dict[str, Document] = {}
+    scores: dict[int | str, float] = {}
+    doc_map: dict[int | str, Document] = {}
 
     for rank, doc in enumerate(semantic_docs):
         doc_id = _doc_identity(doc)
@@ -226,8 +628,9 @@ def hybrid_search(
         scores[doc_id] = scores.get(doc_id, 0.0) + rrf_score
         doc_map[doc_id] = doc
 
-    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return [doc_map[doc_id] for doc_id, _ in ranked[:k]]
+    # Same order as sorted(..., reverse=True)[:k], ties included.
+    ranked = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+    return [doc_map[doc_id] for doc_id, _ in ranked]
 
 
 # ---------------------------------------------------------------------------
@@ -252,6 +655,8 @@ COMPRESS_PROMPT = ChatPromptTemplate.from_messages([
     )),
 ])
 
+_COMPRESS_CACHE_KIND = "compress/v1"
+
 
 def compress_documents(
     question: str,
@@ -259,35 +664,57 @@ def compress_documents(
     llm: ChatOpenAI,
     max_docs: int = 8,
 ) -> list[Document]:
-    """Filter and compress documents to keep only relevant passages."""
-    compressed: list[Document] = []
+    """Filter and compress documents to keep only relevant passages.
 
-    for doc in docs[:max_docs]:
+    Cached results are reused; the remaining LLM calls go out as one
+    ``llm.batch``.  A failed call keeps the original document.
+    """
+    cache = get_llm_cache()
+    model = _model_name(llm)
+    head = docs[:max_docs]
+    results: dict[int, str] = {}
+    misses: list[tuple[int, str, str]] = []
+    for i, doc in enumerate(head):
         if len(doc.page_content) < COMPRESS_MIN_LENGTH:
-            compressed.append(doc)
             continue
-
-        try:
-            msgs = COMPRESS_PROMPT.invoke({
-                "question": question,
-                "content": doc.page_content[:COMPRESS_MAX_CONTENT],
-            })
-            response = llm.invoke(msgs)
-            result = response.content.strip()
-
-            if (
-                result
-                and result != COMPRESS_NON_PERTINENT
-                and len(result) > COMPRESS_MIN_RESULT_LENGTH
-            ):
-                new_doc = Document(
-                    page_content=result,
-                    metadata={**doc.metadata, META_COMPRESSED: True},
-                )
-                compressed.append(new_doc)
-        except Exception:
+        content = doc.page_content[:COMPRESS_MAX_CONTENT]
+        key = cache.make_key(_COMPRESS_CACHE_KIND, model, question, content)
+        cached = cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append((i, key, content))
+
+    responses = llm.batch(
+        [
+            COMPRESS_PROMPT.invoke({"question": question, "content": content})
+            for _, _, content in misses
+        ],
+        config={"max_concurrency": LLM_BATCH_MAX_CONCURRENCY},
+        return_exceptions=True,
+    ) if misses else []
+    for (i, key, _), response in zip(misses, responses):
+        if isinstance(response, Exception):
             logger.debug("Compression failed for a document, keeping original")
+            continue
+        results[i] = response.content.strip()
+        cache.set(key, results[i])
+
+    compressed: list[Document] = []
+    for i, doc in enumerate(head):
+        result = results.get(i)
+        if result is None:
             compressed.append(doc)
+        elif (
+            result
+            and result != COMPRESS_NON_PERTINENT
+            and len(result) > COMPRESS_MIN_RESULT_LENGTH
+        ):
+            new_doc = Document(
+                page_content=result,
+                metadata={**doc.metadata, META_COMPRESSED: True},
+            )
+            compressed.append(new_doc)
 
     compressed.extend(docs[max_docs:])
     return compressed
@@ -310,8 +737,47 @@ RERANK_PROMPT = ChatPromptTemplate.from_messages([
     )),
 ])
 
+_RERANK_CACHE_KIND = "rerank/v1"
+
 _DEFAULT_RERANK_SCORE: float = 5.0
 
+_cross_encoder: Any = None
+_cross_encoder_lock = threading.Lock()
+
+
+def _get_cross_encoder() -> Any:
+    """Return the shared local cross-encoder (loaded on first use)."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+
+                _cross_encoder = CrossEncoder(
+                    RERANK_CROSS_ENCODER_MODEL,
+                    max_length=RERANK_CROSS_ENCODER_MAX_LENGTH,
+                    device="cpu",
+                )
+    return _cross_encoder
+
+
+def _rerank_cross_encoder(
+    question: str,
+    docs: list[Document],
+    top_k: int,
+) -> list[Document]:
+    """Score all (question, passage) pairs in one local forward pass."""
+    pairs = [
+        (question, doc.page_content[:RERANK_MAX_PASSAGE_LENGTH]) for doc in docs
+    ]
+    scores = _get_cross_encoder().predict(
+        pairs,
+        batch_size=RERANK_CROSS_ENCODER_BATCH_SIZE,
+        convert_to_numpy=True,
+    )
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [docs[i] for i in order]
+
 
 def rerank_documents(
     question: str,
@@ -319,34 +785,162 @@ def rerank_documents(
     llm: ChatOpenAI,
     top_k: int = 8,
 ) -> list[Document]:
-    """Re-rank documents by relevance using LLM scoring."""
-    scored: list[tuple[Document, float]] = []
+    """Re-rank documents by relevance using LLM scoring.
 
-    for doc in docs:
+    Cached scores are reused; the remaining passages are scored in one
+    ``llm.batch``.  A failed call gets the default score.  With
+    ``rerank_backend: cross_encoder`` (and sentence-transformers
+    installed) a local cross-encoder scores the passages instead.
+    """
+    if RERANK_BACKEND == RERANK_BACKEND_CROSS_ENCODER and CROSS_ENCODER_AVAILABLE:
         try:
-            msgs = RERANK_PROMPT.invoke({
-                "question": question,
-                "passage": doc.page_content[:RERANK_MAX_PASSAGE_LENGTH],
-            })
-            response = llm.invoke(msgs)
-            text = response.content.strip()
-
-            parsed = _extract_json(text)
-            if parsed is not None:
-                score = float(parsed.get("score", _DEFAULT_RERANK_SCORE))
-            else:
-                match = re.search(r"(\d+\.?\d*)", text)
-                score = float(match.group(1)) if match else _DEFAULT_RERANK_SCORE
-
-            scored.append((doc, score))
+            return _rerank_cross_encoder(question, docs, top_k)
         except Exception:
+            logger.exception("Cross-encoder rerank failed, using the LLM")
+
+    cache = get_llm_cache()
+    model = _model_name(llm)
+    scores: list[float | None] = []
+    misses: list[tuple[int, str, str]] = []
+    for i, doc in enumerate(docs):
+        passage = doc.page_content[:RERANK_MAX_PASSAGE_LENGTH]
+        key = cache.make_key(_RERANK_CACHE_KIND, model, question, passage)
+        score = cache.get(key)
+        scores.append(score)
+        if score is None:
+            misses.append((i, key, passage))
+
+    responses = llm.batch(
+        [
+            RERANK_PROMPT.invoke({"question": question, "passage": passage})
+            for _, _, passage in misses
+        ],
+        config={"max_concurrency": LLM_BATCH_MAX_CONCURRENCY},
+        return_exceptions=True,
+    ) if misses else []
+    for (i, key, _), response in zip(misses, responses):
+        if isinstance(response, Exception):
             logger.debug("Reranking failed for a document, using default score")
-            scored.append((doc, _DEFAULT_RERANK_SCORE))
+            scores[i] = _DEFAULT_RERANK_SCORE
+        else:
+            scores[i] = _parse_rerank_score(response.content)
+            cache.set(key, scores[i])
 
+    scored = list(zip(docs, scores))
     scored.sort(key=lambda x: x[1], reverse=True)
     return [doc for doc, _ in scored[:top_k]]
 
 
+def _parse_rerank_score(text: str) -> float:
+    """Read the 0-10 score from a rerank reply (JSON, else first number)."""
+    text = text.strip()
+    try:
+        parsed = extract_json(text)
+        if parsed is not None:
+            return float(parsed.get("score", _DEFAULT_RERANK_SCORE))
+        match = re.search(r"(\d+\.?\d*)", text)
+        return float(match.group(1)) if match else _DEFAULT_RERANK_SCORE
+    except (TypeError, ValueError):
+        logger.debug("Unparseable rerank score, using default")
+        return _DEFAULT_RERANK_SCORE
+
+
+RERANK_COMPRESS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "Tu es un evaluateur de pertinence qui filtre des extraits de cours. "
+        "Etant donne une question et un extrait de document :\n"
+        "1. Donne un score de 0 a 10 indiquant si l'extrait est pertinent "
+        "pour repondre a la question\n"
+        "2. Extrais UNIQUEMENT les passages directement pertinents, tels quels "
+        "(ne reformule pas), en gardant formules, definitions et exemples\n"
+        "3. Si l'extrait est completement hors sujet, l'extrait vaut "
+        "'NON_PERTINENT'\n\n"
+        "Reponds UNIQUEMENT avec un JSON : "
+        "{{\"score\": N, \"extrait\": \"passages pertinents\"}}"
+    )),
+    ("human", (
+        "Question : {question}\n\n"
+        "Extrait du document :\n{content}\n\n"
+        "Score et passages pertinents :"
+    )),
+])
+
+_RERANK_COMPRESS_CACHE_KIND = "rerank_compress/v1"
+
+
+def rerank_and_compress(
+    question: str,
+    docs: list[Document],
+    llm: ChatOpenAI,
+    top_k: int = 8,
+    max_docs: int = 6,
+) -> list[Document]:
+    """Re-rank and compress documents with one LLM call per document.
+
+    Same result shape as ``rerank_documents`` followed by
+    ``compress_documents``: documents sorted by score, the first
+    *max_docs* replaced by their relevant passages (dropped when off
+    topic), the rest kept as is.  A reply that cannot be parsed keeps
+    the original document with whatever score could be read.
+    """
+    cache = get_llm_cache()
+    model = _model_name(llm)
+    results: list[tuple[float, str | None] | None] = []
+    misses: list[tuple[int, str, str]] = []
+    for i, doc in enumerate(docs):
+        content = doc.page_content[:COMPRESS_MAX_CONTENT]
+        key = cache.make_key(_RERANK_COMPRESS_CACHE_KIND, model, question, content)
+        cached = cache.get(key)
+        results.append(cached)
+        if cached is None:
+            misses.append((i, key, content))
+
+    responses = llm.batch(
+        [
+            RERANK_COMPRESS_PROMPT.invoke({"question": question, "content": content})
+            for _, _, content in misses
+        ],
+        config={"max_concurrency": LLM_BATCH_MAX_CONCURRENCY},
+        return_exceptions=True,
+    ) if misses else []
+    for (i, key, _), response in zip(misses, responses):
+        if isinstance(response, Exception):
+            logger.debug("Rerank/compress failed for a document, keeping original")
+            results[i] = (_DEFAULT_RERANK_SCORE, None)
+            continue
+        text = response.content.strip()
+        parsed = extract_json(text)
+        try:
+            if parsed is None:
+                raise ValueError(text)
+            score = float(parsed.get("score", _DEFAULT_RERANK_SCORE))
+            extract = parsed.get("extrait")
+            results[i] = (score, extract.strip() if isinstance(extract, str) else None)
+            cache.set(key, results[i])
+        except (TypeError, ValueError):
+            results[i] = (_parse_rerank_score(text), None)
+
+    order = sorted(range(len(docs)), key=lambda i: results[i][0], reverse=True)
+    ranked = order[:top_k]
+
+    out: list[Document] = []
+    for i in ranked[:max_docs]:
+        doc = docs[i]
+        extract = results[i][1]
+        if len(doc.page_content) < COMPRESS_MIN_LENGTH or extract is None:
+            out.append(doc)
+        elif (
+            extract != COMPRESS_NON_PERTINENT
+            and len(extract) > COMPRESS_MIN_RESULT_LENGTH
+        ):
+            out.append(Document(
+                page_content=extract,
+                metadata={**doc.metadata, META_COMPRESSED: True},
+            ))
+    out.extend(docs[i] for i in ranked[max_docs:])
+    return out
+
+
 # ---------------------------------------------------------------------------
 # 6. Enhanced RAG Pipeline (combines all improvements)
 # ---------------------------------------------------------------------------
@@ -370,7 +964,12 @@ def enhanced_retrieve(
     query_for_search = question
 
     if enable_rewrite:
-        rewrite_result = rewrite_query(question, llm, chat_context)
+        rewrite_result = rewrite_query(
+            question,
+            llm,
+            chat_context,
+            embeddings=getattr(vectorstore, "embeddings", None),
+        )
         query_for_search = rewrite_result["rewritten"]
         steps.append("query_rewrite")
 
@@ -384,27 +983,37 @@ def enhanced_retrieve(
         )
         steps.append("hybrid_search")
     else:
-        search_kwargs: dict[str, Any] = {
-            "k": nb_sources,
-            "fetch_k": nb_sources * FETCH_K_MULTIPLIER,
-        }
-        if filter_dict:
-            search_kwargs["filter"] = filter_dict
-
-        retriever = vectorstore.as_retriever(
-            search_type=SEARCH_TYPE_MMR,
-            search_kwargs=search_kwargs,
+        retriever = _get_mmr_retriever(
+            vectorstore,
+            nb_sources,
+            nb_sources * FETCH_K_MULTIPLIER,
+            filter_dict,
         )
         docs = retriever.invoke(query_for_search)
         steps.append("semantic_search")
 
-    if enable_rerank and len(docs) > 3:
-        docs = rerank_documents(question, docs, llm, top_k=nb_sources)
-        steps.append("rerank")
+    # Duplicate chunks (a source imported twice, MMR on a store holding
+    # copies) would each cost their own rerank / compression call.
+    docs = _dedupe_documents(docs)
 
-    if enable_compress:
-        docs = compress_documents(question, docs, llm, max_docs=6)
-        steps.append("compress")
+    rerank = enable_rerank and len(docs) > 3
+    llm_rerank = not (
+        RERANK_BACKEND == RERANK_BACKEND_CROSS_ENCODER and CROSS_ENCODER_AVAILABLE
+    )
+
+    if rerank and enable_compress and llm_rerank:
+        # One LLM call per document instead of a rerank call plus a
+        # compression call.
+        docs = rerank_and_compress(question, docs, llm, top_k=nb_sources, max_docs=6)
+        steps.extend(["rerank", "compress"])
+    else:
+        if rerank:
+            docs = rerank_documents(question, docs, llm, top_k=nb_sources)
+            steps.append("rerank")
+
+        if enable_compress:
+            docs = compress_documents(question, docs, llm, max_docs=6)
+            steps.append("compress")
 
     return {
         "documents": docs,
@@ -419,18 +1028,131 @@ def enhanced_retrieve(
 # ---------------------------------------------------------------------------
 
 
-def _extract_json(text: str) -> dict | None:
-    """Try to parse a JSON object from *text*. Returns None on failure."""
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
+# Retrievers are cheap to use but not to build (LangChain wrapper +
+# validation), and the (filter, k) combinations seen in practice are few.
+# LRU: a burst of one-off filters evicts only the coldest entries.
+_RETRIEVER_CACHE: OrderedDict[tuple, Any] = OrderedDict()
+_RETRIEVER_CACHE_MAX_SIZE: int = 64
+_RETRIEVER_CACHE_LOCK = threading.Lock()
+
+
+def _freeze_filter(value: Any) -> Any:
+    """Turn a Chroma filter dict into a hashable, order-stable key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze_filter(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_filter(v) for v in value)
+    return value
+
+
+def _get_mmr_retriever(
+    vectorstore: Any,
+    k: int,
+    fetch_k: int,
+    filter_dict: dict | None = None,
+) -> Any:
+    """Return a cached MMR retriever for (*vectorstore*, *k*, *fetch_k*, filter).
+
+    The cached retriever holds a reference to *vectorstore*, so its
+    ``id`` cannot be recycled while the entry is alive.
+    """
+    key = (id(vectorstore), k, fetch_k, _freeze_filter(filter_dict or None))
+    with _RETRIEVER_CACHE_LOCK:
+        retriever = _RETRIEVER_CACHE.get(key)
+        if retriever is not None:
+            _RETRIEVER_CACHE.move_to_end(key)
+            return retriever
+
+    search_kwargs: dict[str, Any] = {"k": k, "fetch_k": fetch_k}
+    if filter_dict:
+        search_kwargs["filter"] = filter_dict
+    retriever = vectorstore.as_retriever(
+        search_type=SEARCH_TYPE_MMR,
+        search_kwargs=search_kwargs,
+    )
+    with _RETRIEVER_CACHE_LOCK:
+        _RETRIEVER_CACHE[key] = retriever
+        if len(_RETRIEVER_CACHE) > _RETRIEVER_CACHE_MAX_SIZE:
+            _RETRIEVER_CACHE.popitem(last=False)
+    return retriever
+
+
+def _model_name(llm: Any) -> str:
+    """Model answering through *llm*, part of every LLM cache key."""
+    return getattr(llm, "model_name", None) or LLM_MODEL
+
+
+def extract_json(text: str) -> dict | None:
+    """Try to parse a JSON object from *text*. Returns None on failure.
+
+    A bare JSON reply is parsed directly.  Otherwise the first balanced
+    ``{...}`` span is located in one pass (tracking brace depth and
+    string/escape state), so prose or a second object around it does not
+    end up in the parsed slice.
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
         try:
-            return json.loads(text[start : end + 1])
-        except json.JSONDecodeError:
-            return None
+            parsed = orjson.loads(stripped)
+            return parsed if isinstance(parsed, dict) else None
+        except orjson.JSONDecodeError:
+            pass
+
+    start = text.find("{")
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        parsed = orjson.loads(text[start : i + 1])
+                        return parsed if isinstance(parsed, dict) else None
+                    except orjson.JSONDecodeError:
+                        break
+        else:
+            return None  # unbalanced to the end of the text
+        start = text.find("{", start + 1)
     return None
 
 
-def _doc_identity(doc: Document) -> str:
-    """Build a simple identity key for RRF deduplication."""
-    return doc.metadata.get(META_FILENAME, "") + ":" + doc.page_content[:100]
+def _dedupe_documents(docs: list[Document]) -> list[Document]:
+    """Drop repeated chunks (same ``_doc_identity``), keeping the first."""
+    seen: set[int | str] = set()
+    unique: list[Document] = []
+    for doc in docs:
+        key = _doc_identity(doc)
+        if key not in seen:
+            seen.add(key)
+            unique.append(doc)
+    return unique
+
+
+def _doc_identity(doc: Document) -> int | str:
+    """Build an identity key for RRF deduplication.
+
+    The ``chunk_id`` stamped by the indexer when present; otherwise a
+    64-bit digest of filename + full content (chunks added by the
+    YouTube / Drive / Notion importers), so chunks sharing a 100-char
+    prefix never collide.
+    """
+    chunk_id = doc.metadata.get(META_CHUNK_ID)
+    if chunk_id:
+        return chunk_id
+    return xxhash.xxh64_intdigest(
+        (doc.metadata.get(META_FILENAME, "") + "\x00" + doc.page_content).encode()
+    )
@@ -13,6 +13,12 @@ from core.constants import (
     SUSPICIOUS_PATTERNS,
 )
 
+# One alternation scanned once per question instead of one re.search
+# (and pattern-cache lookup) per pattern.
+_SUSPICIOUS_RE = re.compile(
+    "|".join(f"(?:{p})" for p in SUSPICIOUS_PATTERNS), re.IGNORECASE
+)
+
 
 def validate_question(question: str, max_length: int = MAX_QUESTION_LENGTH) -> tuple[bool, str]:
     """
@@ -39,9 +45,8 @@ def validate_question(question: str, max_length: int = MAX_QUESTION_LENGTH) -> t
     if len(question) > max_length:
         return False, f"Question trop longue (maximum {max_length} caractères)"
     
-    for pattern in SUSPICIOUS_PATTERNS:
-        if re.search(pattern, question, re.IGNORECASE):
-            return False, "Question contient des caractères suspects"
+    if _SUSPICIOUS_RE.search(question):
+        return False, "Question contient des caractères suspects"
     
     return True, ""
 
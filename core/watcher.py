@@ -7,11 +7,59 @@ import os
 import time
 import signal
 import sys
-import fnmatch
+import threading
 from pathlib import Path
 from datetime import datetime
 
-from core.config import CONFIG, COURSES_DIR, SUPPORTED_EXTENSIONS, EXCLUDED_PATTERNS
+from core.config import CONFIG, COURSES_DIR, SUPPORTED_EXTENSIONS
+from core.paths import is_excluded
+
+# ---------------------------------------------------------------------------
+# Optional dependency — graceful fallback
+# ---------------------------------------------------------------------------
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+_EXTENSIONS: frozenset[str] = frozenset(SUPPORTED_EXTENSIONS)
+
+
+def _scan(
+    directory: str,
+    rel_dir: str,
+    file_states: dict[str, tuple[float, int]],
+) -> None:
+    """Recursive ``os.scandir`` walk filling *file_states*.
+
+    ``DirEntry`` carries the file type from the directory listing, so
+    each file costs one ``stat`` (``os.walk`` + ``os.stat`` paid two).
+    """
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            try:
+                if entry.is_dir():
+                    # Like os.walk: symlinked directories are not followed.
+                    # Nothing below an excluded directory is indexed.
+                    if not entry.is_symlink() and not is_excluded(rel_path):
+                        _scan(entry.path, rel_path, file_states)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in _EXTENSIONS:
+                    continue
+                if is_excluded(rel_path):
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            file_states[entry.path] = (stat.st_mtime, stat.st_size)
 
 
 def get_directory_hash(directory: Path) -> dict[str, tuple[float, int]]:
@@ -20,38 +68,130 @@ def get_directory_hash(directory: Path) -> dict[str, tuple[float, int]]:
     Returns a dict mapping filepath -> (mtime, size).
     """
     file_states: dict[str, tuple[float, int]] = {}
+    _scan(str(directory), "", file_states)
+    return file_states
 
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            ext = os.path.splitext(filename)[1].lower()
-            if ext not in SUPPORTED_EXTENSIONS:
-                continue
 
-            filepath = os.path.join(root, filename)
+def _print_changes(label: str, paths: set[str]) -> None:
+    print(f"  {label}:")
+    for fp in sorted(paths)[:5]:
+        print(f"    - {os.path.basename(fp)}")
+    if len(paths) > 5:
+        print(f"    ... et {len(paths) - 5} autres")
 
-            rel_path = os.path.relpath(filepath, directory)
-            skip = False
-            for pattern in EXCLUDED_PATTERNS:
-                if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(filename, pattern):
-                    skip = True
-                    break
 
-            if skip:
-                continue
+def _handle_changes(
+    previous_state: dict[str, tuple[float, int]],
+    current_state: dict[str, tuple[float, int]],
+    auto_reindex: bool,
+) -> bool:
+    """Report the differences between two snapshots and reindex if needed.
 
-            try:
-                stat = os.stat(filepath)
-                file_states[filepath] = (stat.st_mtime, stat.st_size)
-            except OSError:
-                pass
+    Returns True if anything changed.
+    """
+    from core.indexer import main as run_indexer
 
-    return file_states
+    added = set(current_state.keys()) - set(previous_state.keys())
+    removed = set(previous_state.keys()) - set(current_state.keys())
+    modified = {
+        fp for fp in current_state
+        if fp in previous_state and current_state[fp] != previous_state[fp]
+    }
+
+    if not (added or removed or modified):
+        return False
+
+    print("CHANGEMENTS DETECTES")
+
+    if added:
+        _print_changes(f"+ {len(added)} fichiers ajoutes", added)
+    if removed:
+        _print_changes(f"- {len(removed)} fichiers supprimes", removed)
+    if modified:
+        _print_changes(f"~ {len(modified)} fichiers modifies", modified)
+
+    if auto_reindex:
+        print("\nLancement de la reindexation incrementale...")
+        print("-" * 60)
+        try:
+            run_indexer(incremental=True, force_full=False)
+            print("-" * 60)
+            print("Reindexation terminee.\n")
+        except Exception as exc:
+            print(f"ERREUR lors de la reindexation: {exc}\n")
+    else:
+        print("\nAuto-reindexation desactivee. Lancez manuellement:")
+        print("  python -m scripts.index --incremental\n")
+    return True
+
+
+def _poll(
+    previous_state: dict[str, tuple[float, int]],
+    check_interval: int,
+    auto_reindex: bool,
+) -> None:
+    """Re-snapshot the tree every *check_interval* seconds."""
+    check_count = 0
+    while True:
+        time.sleep(check_interval)
+        check_count += 1
+
+        current_time = datetime.now().strftime("%H:%M:%S")
+        print(f"[{current_time}] Verification #{check_count}...", end=" ")
+
+        current_state = get_directory_hash(COURSES_DIR)
+        if _handle_changes(previous_state, current_state, auto_reindex):
+            previous_state = current_state
+        else:
+            print("Aucun changement")
+
+
+def _watch_events(
+    previous_state: dict[str, tuple[float, int]],
+    debounce: float,
+    auto_reindex: bool,
+) -> None:
+    """Re-snapshot the tree only after OS file events (inotify, FSEvents...).
+
+    A burst of events (copying a folder, saving a PDF in several writes)
+    is debounced: the snapshot is taken once no event has arrived for
+    *debounce* seconds.  The snapshot diff keeps the reporting identical
+    to the polling mode and filters out events on unsupported files.
+    """
+    dirty = threading.Event()
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event) -> None:
+            # Open / close events fire while the indexer reads the files.
+            if event.event_type in ("created", "deleted", "modified", "moved"):
+                dirty.set()
+
+    observer = Observer()
+    observer.schedule(_Handler(), str(COURSES_DIR), recursive=True)
+    observer.daemon = True
+    observer.start()
+
+    while True:
+        dirty.wait()
+        while dirty.is_set():
+            dirty.clear()
+            time.sleep(debounce)
+
+        current_state = get_directory_hash(COURSES_DIR)
+        current_time = datetime.now().strftime("%H:%M:%S")
+        print(f"[{current_time}]", end=" ")
+        if _handle_changes(previous_state, current_state, auto_reindex):
+            previous_state = current_state
+        else:
+            print("Aucun changement")
 
 
 def watch_and_reindex() -> None:
-    """Watch the courses directory and reindex when changes are detected."""
-    from core.indexer import main as run_indexer
+    """Watch the courses directory and reindex when changes are detected.
 
+    Uses OS file notifications when ``watchdog`` is installed, otherwise
+    polls every ``check_interval_seconds``.
+    """
     watch_config = CONFIG.get("watch_mode", {})
 
     if not watch_config.get("enabled", False):
@@ -60,13 +200,18 @@ def watch_and_reindex() -> None:
         return
 
     check_interval = watch_config.get("check_interval_seconds", 60)
+    debounce = watch_config.get("debounce_seconds", 2.0)
     auto_reindex = watch_config.get("auto_reindex", True)
 
     print("=" * 60)
     print("Mode surveillance actif - RAG Master 1")
     print("=" * 60)
     print(f"Dossier surveille : {COURSES_DIR}")
-    print(f"Intervalle de verification : {check_interval}s")
+    if WATCHDOG_AVAILABLE:
+        print(f"Detection : evenements systeme (delai {debounce}s)")
+    else:
+        print(f"Intervalle de verification : {check_interval}s")
+        print("  (pip install watchdog pour une detection instantanee)")
     print(f"Auto-reindexation : {'Oui' if auto_reindex else 'Non'}")
     print("\nCtrl+C pour arreter\n")
 
@@ -80,63 +225,10 @@ def watch_and_reindex() -> None:
 
     signal.signal(signal.SIGINT, signal_handler)
 
-    check_count = 0
-    while True:
-        time.sleep(check_interval)
-        check_count += 1
-
-        current_time = datetime.now().strftime("%H:%M:%S")
-        print(f"[{current_time}] Verification #{check_count}...", end=" ")
-
-        current_state = get_directory_hash(COURSES_DIR)
-
-        added = set(current_state.keys()) - set(previous_state.keys())
-        removed = set(previous_state.keys()) - set(current_state.keys())
-        modified = {
-            fp for fp in current_state
-            if fp in previous_state and current_state[fp] != previous_state[fp]
-        }
-
-        if added or removed or modified:
-            print("CHANGEMENTS DETECTES")
-
-            if added:
-                print(f"  + {len(added)} fichiers ajoutes:")
-                for fp in sorted(added)[:5]:
-                    print(f"    - {os.path.basename(fp)}")
-                if len(added) > 5:
-                    print(f"    ... et {len(added) - 5} autres")
-
-            if removed:
-                print(f"  - {len(removed)} fichiers supprimes:")
-                for fp in sorted(removed)[:5]:
-                    print(f"    - {os.path.basename(fp)}")
-                if len(removed) > 5:
-                    print(f"    ... et {len(removed) - 5} autres")
-
-            if modified:
-                print(f"  ~ {len(modified)} fichiers modifies:")
-                for fp in sorted(modified)[:5]:
-                    print(f"    - {os.path.basename(fp)}")
-                if len(modified) > 5:
-                    print(f"    ... et {len(modified) - 5} autres")
-
-            if auto_reindex:
-                print("\nLancement de la reindexation incrementale...")
-                print("-" * 60)
-                try:
-                    run_indexer(incremental=True, force_full=False)
-                    print("-" * 60)
-                    print("Reindexation terminee.\n")
-                except Exception as exc:
-                    print(f"ERREUR lors de la reindexation: {exc}\n")
-            else:
-                print("\nAuto-reindexation desactivee. Lancez manuellement:")
-                print("  python -m scripts.index --incremental\n")
-
-            previous_state = current_state
-        else:
-            print("Aucun changement")
+    if WATCHDOG_AVAILABLE:
+        _watch_events(previous_state, debounce, auto_reindex)
+    else:
+        _poll(previous_state, check_interval, auto_reindex)
 
 
 if __name__ == "__main__":
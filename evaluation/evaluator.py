@@ -6,37 +6,47 @@ and provides detailed per-question diagnostics.  Can be run standalone
 (CLI) or imported by the Streamlit UI for interactive evaluation.
 """
 
-import json
+from __future__ import annotations
+
 import logging
+import os
+import shutil
+import tempfile
+import threading
 import time
 import re
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from dataclasses import dataclass, field, asdict
 
 import numpy as np
+import orjson
+import xxhash
 
 logger = logging.getLogger(__name__)
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
+from langchain_core.prompt_values import PromptValue
 from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel
 
+from core.clients import get_http_client, make_embeddings, open_vectorstore
 from core.config import OPENAI_API_KEY, CHROMA_DIR, EVAL_RESULTS_DIR
 from core.constants import (
     LLM_MODEL,
     LLM_JUDGE_TEMPERATURE,
-    EMBEDDING_MODEL,
     META_MATIERE,
     META_DOC_TYPE,
     META_FILENAME,
     DEFAULT_MATIERE,
     DEFAULT_DOC_TYPE,
     DEFAULT_NB_SOURCES,
+    CONTEXT_SEPARATOR,
     FETCH_K_MULTIPLIER,
     SEARCH_TYPE_MMR,
-    SYSTEM_PROMPT,
+    BM25_INDEX_NAME,
     EVAL_WEIGHT_FAITHFULNESS,
     EVAL_WEIGHT_RELEVANCE,
     EVAL_WEIGHT_COMPLETENESS,
@@ -46,11 +56,28 @@ from core.constants import (
     EVAL_WEIGHT_KEYWORD_HIT,
     EVAL_LATEST_FILENAME,
     EVAL_HISTORY_GLOB,
-    EVAL_MAX_CONTEXT_LENGTH,
-    EVAL_MAX_ANSWER_LENGTH,
-    EVAL_MAX_ANSWER_JUDGE,
+    EVAL_JUDGE_CACHE_FILENAME,
+    EVAL_EMBED_CACHE_FILENAME,
+    EVAL_MAX_WORKERS,
+    EVAL_JUDGE_COMBINED,
+    EVAL_JUDGE_SEPARATE,
+    EVAL_BATCH_ENDPOINT,
+    EVAL_BATCH_COMPLETION_WINDOW,
+    EVAL_BATCH_POLL_SECONDS,
+    EVAL_MAX_CONTEXT_TOKENS,
+    EVAL_MAX_ANSWER_TOKENS,
+    EVAL_MAX_ANSWER_JUDGE_TOKENS,
+    EVAL_MAX_EXPECTED_TOKENS,
+    EVAL_CHARS_PER_TOKEN,
     EVAL_MAX_EMBED_LENGTH,
+    EVAL_EMBEDDING_DIMENSIONS,
 )
+from core.prompts import build_messages
+from core.retrieval import extract_json
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 # ---------------------------------------------------------------------------
 # Evaluation dataset -- ground-truth Q&A pairs per subject
@@ -170,6 +197,7 @@ class AnswerMetrics:
     keyword_coverage: float = 0.0
     semantic_similarity: float = 0.0
     answer_length: int = 0
+    judge_version: str = ""
 
 
 @dataclass
@@ -199,9 +227,25 @@ class EvalSummary:
     avg_latency: float = 0.0
     overall_score: float = 0.0
     timestamp: str = ""
+    # Judge(s) behind the scores, comma-separated ("" in older runs:
+    # separate prompts).  Judge scores only compare between equal versions.
+    judge_version: str = ""
     results: list[dict] = field(default_factory=list)
 
 
+class JudgeScore(BaseModel):
+    """Structured LLM-judge verdict (OpenAI JSON-schema output)."""
+    score: float
+    justification: str
+
+
+class CombinedJudgeScores(BaseModel):
+    """Verdicts of ``COMBINED_JUDGE_PROMPT``, one per judge criterion."""
+    faithfulness: JudgeScore
+    relevance: JudgeScore
+    completeness: JudgeScore
+
+
 # ---------------------------------------------------------------------------
 # LLM-as-Judge prompts
 # ---------------------------------------------------------------------------
@@ -271,24 +315,74 @@ COMPLETENESS_PROMPT = ChatPromptTemplate.from_messages([
     )),
 ])
 
+JUDGE_CRITERIA: tuple[str, ...] = ("faithfulness", "relevance", "completeness")
+
+# The three rubrics above in a single call: one round-trip per question
+# and the shared inputs (question, answer) are sent once.  This changes
+# what is measured: relevance and completeness are judged with the
+# retrieved context in view and the answer capped at
+# EVAL_MAX_ANSWER_TOKENS (the separate prompts get no context and
+# EVAL_MAX_ANSWER_JUDGE_TOKENS).  Scores are tagged EVAL_JUDGE_COMBINED
+# so they are not compared with separate-judge runs.
+COMBINED_JUDGE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "Tu es un evaluateur strict pour un systeme RAG universitaire.\n"
+        "Tu dois noter la reponse generee selon trois criteres, chacun entre 0 et 1.\n\n"
+        "1. faithfulness -- la reponse est-elle coherente avec le contexte fourni ?\n"
+        "- 1.0 : La reponse est entierement fondee sur le contexte\n"
+        "- 0.8 : Essentiel correct, quelques elaborations pedagogiques mineures\n"
+        "- 0.7 : Majoritairement fidele, ajouts de connaissance generale acceptables\n"
+        "- 0.5 : Mix de contenu source et d'ajouts significatifs non fondes\n"
+        "- 0.3 : Beaucoup d'informations inventees\n"
+        "- 0.0 : Completement hallucine, rien ne vient du contexte\n"
+        "Les explications pedagogiques qui CLARIFIENT le contexte et les definitions "
+        "standards coherentes avec lui sont acceptables ; seules les CONTRADICTIONS "
+        "ou INVENTIONS factuelles sont des hallucinations. Si la reponse dit que les "
+        "documents ne couvrent pas le sujet, score >= 0.7.\n\n"
+        "2. relevance -- la reponse repond-elle bien a la question posee ?\n"
+        "- 1.0 : Repond parfaitement a la question\n"
+        "- 0.7 : Repond correctement mais manque de precision\n"
+        "- 0.5 : Repond partiellement\n"
+        "- 0.3 : Repond vaguement ou hors sujet en partie\n"
+        "- 0.0 : Ne repond pas du tout a la question\n\n"
+        "3. completeness -- la reponse couvre-t-elle les informations de la reponse attendue ?\n"
+        "- 1.0 : Couvre toutes les informations attendues\n"
+        "- 0.7 : Couvre la majorite des points\n"
+        "- 0.5 : Couvre environ la moitie\n"
+        "- 0.3 : Couvre peu de points\n"
+        "- 0.0 : Ne couvre aucun point attendu\n\n"
+        "Reponds UNIQUEMENT avec un JSON : "
+        "{{\"faithfulness\": {{\"score\": X, \"justification\": \"...\"}}, "
+        "\"relevance\": {{...}}, \"completeness\": {{...}}}}"
+    )),
+    ("human", (
+        "Question : {question}\n\n"
+        "Contexte (documents recuperes) :\n{context}\n\n"
+        "Reponse attendue :\n{expected}\n\n"
+        "Reponse generee :\n{answer}\n\n"
+        "Evalue la reponse selon les trois criteres."
+    )),
+])
+
 
 # ---------------------------------------------------------------------------
 # Evaluation functions
 # ---------------------------------------------------------------------------
 
+# Fallback when the judge does not answer in JSON: first number in the text.
+_SCORE_RE = re.compile(r"(\d+\.?\d*)")
+
+
 def _parse_llm_score(response_text: str) -> tuple[float, str]:
     """Extract score and justification from LLM judge response."""
-    try:
-        text = response_text.strip()
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1:
-            data = json.loads(text[start:end + 1])
+    data = extract_json(response_text)
+    if data is not None:
+        try:
             return float(data.get("score", 0.0)), data.get("justification", "")
-    except (json.JSONDecodeError, ValueError):
-        pass
+        except (TypeError, ValueError):
+            pass
 
-    match = re.search(r"(\d+\.?\d*)", response_text)
+    match = _SCORE_RE.search(response_text)
     if match:
         score = float(match.group(1))
         if score > 1.0:
@@ -298,27 +392,69 @@ def _parse_llm_score(response_text: str) -> tuple[float, str]:
     return 0.0, "Impossible d'extraire le score"
 
 
-def _normalize_text(text: str) -> str:
-    """Normalize text: lowercase, strip accents, collapse whitespace."""
-    text = text.lower()
+def _strip_marks(text: str) -> str:
+    """Drop combining marks after NFD decomposition (é -> e)."""
     text = unicodedata.normalize("NFD", text)
-    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+
+# ``_strip_marks`` precomputed for Latin-1, Latin Extended-A/B and the
+# punctuation / currency blocks (typographic quotes, dashes, €), which
+# covers French text.  The regex scan runs in C and only the accented
+# letters (a few percent of French text) call back into Python for the
+# table lookup, which beats both the per-character NFD loop and
+# ``str.translate`` (a dict lookup per character).  Anything beyond these
+# blocks (including loose combining marks, U+0300+) still goes through
+# ``_strip_marks``.
+_TABLE_RANGES = ((0x80, 0x250), (0x2000, 0x20D0))
+_ACCENT_TABLE: dict[str, str] = {
+    c: stripped
+    for start, stop in _TABLE_RANGES
+    for c in map(chr, range(start, stop))
+    if (stripped := _strip_marks(c)) != c
+}
+_ACCENT_RE = re.compile("[" + "".join(_ACCENT_TABLE) + "]")
+_BEYOND_TABLE_RE = re.compile("[^\\x00-\\u024f\\u2000-\\u20cf]")
+
+
+def _accent_replacement(match: re.Match[str]) -> str:
+    """``_ACCENT_RE.sub`` callback: the table entry for the matched letter."""
+    return _ACCENT_TABLE[match[0]]
+
+
+def _normalize_text(text: str) -> str:
+    """Normalize text: lowercase, strip accents."""
+    text = _ACCENT_RE.sub(_accent_replacement, text.lower())
+    if _BEYOND_TABLE_RE.search(text):
+        text = _strip_marks(text)
     return text
 
 
+@lru_cache(maxsize=1024)
+def _keyword_patterns(keywords: tuple[str, ...]) -> tuple[tuple[str, str | None], ...]:
+    """Normalised ``(keyword, 4-char prefix or None)`` pairs, memoised.
+
+    Dataset keyword lists are constant, so each is normalised once per
+    process.  The prefix gives partial credit to keywords of 5+ chars.
+    """
+    patterns = []
+    for kw in keywords:
+        kw_norm = _normalize_text(kw)
+        patterns.append((kw_norm, kw_norm[:4] if len(kw_norm) >= 5 else None))
+    return tuple(patterns)
+
+
 def compute_keyword_ratio(text: str, keywords: list[str]) -> float:
     """Compute the fraction of *keywords* found in *text*."""
     if not keywords:
         return 1.0
     text_norm = _normalize_text(text)
-    hits = 0
-    for kw in keywords:
-        kw_norm = _normalize_text(kw)
-        if kw_norm in text_norm:
-            hits += 1
-            continue
-        if len(kw_norm) >= 5 and kw_norm[:4] in text_norm:
-            hits += 0.5
+    hits = sum(
+        1.0 if kw_norm in text_norm
+        else 0.5 if prefix is not None and prefix in text_norm
+        else 0.0
+        for kw_norm, prefix in _keyword_patterns(tuple(keywords))
+    )
     return hits / len(keywords)
 
 
@@ -328,14 +464,47 @@ def compute_semantic_similarity(
     embeddings: OpenAIEmbeddings,
 ) -> float:
     """Compute cosine similarity between two texts using embeddings."""
+    return compute_semantic_similarities([(text_a, text_b)], embeddings)[0]
+
+
+def compute_semantic_similarities(
+    pairs: list[tuple[str, str]],
+    embeddings: OpenAIEmbeddings,
+) -> list[float]:
+    """Cosine similarity of every ``(text_a, text_b)`` pair.
+
+    All texts are embedded in a single ``embed_documents`` call: the API
+    round-trip, not the cosine, dominates the cost.  Pairs with an empty
+    side score 0 and identical pairs score 1 without being embedded (an
+    empty input would also make the API reject the whole batch).
+    """
+    sims = [0.0] * len(pairs)
+    pending: list[int] = []
+    for i, (text_a, text_b) in enumerate(pairs):
+        a, b = text_a.strip(), text_b.strip()
+        if not a or not b:
+            continue
+        if a == b:
+            sims[i] = 1.0
+        else:
+            pending.append(i)
+    if not pending:
+        return sims
+
+    texts = [t[:EVAL_MAX_EMBED_LENGTH] for i in pending for t in pairs[i]]
     try:
-        vecs = embeddings.embed_documents([text_a[:EVAL_MAX_EMBED_LENGTH], text_b[:EVAL_MAX_EMBED_LENGTH]])
-        a = np.array(vecs[0])
-        b = np.array(vecs[1])
-        cos_sim = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-10))
-        return max(0.0, cos_sim)
+        vecs = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
     except Exception:
-        return 0.0
+        return sims
+    vecs = vecs.reshape(len(pending), 2, -1)
+    a, b = vecs[:, 0], vecs[:, 1]
+    dots = np.einsum("ij,ij->i", a, b)
+    if not getattr(embeddings, "normalized", False):
+        dots /= np.sqrt(np.einsum("ij,ij->i", a, a) * np.einsum("ij,ij->i", b, b)) + 1e-10
+    cosines = np.maximum(dots, 0.0)
+    for i, cosine in zip(pending, cosines.tolist()):
+        sims[i] = cosine
+    return sims
 
 
 def evaluate_retrieval(
@@ -347,35 +516,189 @@ def evaluate_retrieval(
     if not docs:
         return RetrievalMetrics()
 
-    subject_matches = sum(
-        1 for d in docs
-        if d.metadata.get(META_MATIERE, "").lower() == expected_subject.lower()
-    )
-
-    all_text = " ".join(d.page_content for d in docs)
-    keyword_hits = compute_keyword_ratio(all_text, expected_keywords)
-
-    unique_files = {d.metadata.get(META_FILENAME, "") for d in docs}
+    expected = expected_subject.lower()
+    subject_matches = 0
+    total_length = 0
+    unique_files: set[str] = set()
+    parts: list[str] = []
+    for d in docs:
+        meta = d.metadata
+        content = d.page_content
+        if meta.get(META_MATIERE, "").lower() == expected:
+            subject_matches += 1
+        unique_files.add(meta.get(META_FILENAME, ""))
+        total_length += len(content)
+        parts.append(content)
 
     return RetrievalMetrics(
         num_docs_retrieved=len(docs),
-        subject_match_ratio=subject_matches / len(docs) if docs else 0.0,
-        keyword_hit_ratio=keyword_hits,
-        avg_doc_length=sum(len(d.page_content) for d in docs) / len(docs),
+        subject_match_ratio=subject_matches / len(docs),
+        keyword_hit_ratio=compute_keyword_ratio(" ".join(parts), expected_keywords),
+        avg_doc_length=total_length / len(docs),
         unique_sources=len(unique_files),
     )
 
 
+@lru_cache(maxsize=1)
+def _judge_encoding() -> Any:
+    """tiktoken encoding of the judge model, or None if unavailable."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(LLM_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken downloads its BPE files on first use; offline, fall
+        # back to an approximate character cap.
+        logger.warning("Encodage tiktoken indisponible, troncature par caracteres")
+        return None
+
+
+def _truncate_tokens(text: str, *max_tokens: int) -> tuple[str, ...]:
+    """*text* truncated to each of *max_tokens* judge-model tokens.
+
+    The text is encoded at most once, whatever the number of caps.
+    """
+    if len(text) <= min(max_tokens):
+        # A token is at least one character.
+        return (text,) * len(max_tokens)
+    encoding = _judge_encoding()
+    if encoding is None:
+        return tuple(text[:n * EVAL_CHARS_PER_TOKEN] for n in max_tokens)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= min(max_tokens):
+        return (text,) * len(max_tokens)
+    return tuple(
+        text if len(tokens) <= n else encoding.decode(tokens[:n])
+        for n in max_tokens
+    )
+
+
+def _judge_score(response: dict[str, Any] | Exception) -> float:
+    """Score from a ``with_structured_output(include_raw=True)`` result."""
+    if isinstance(response, Exception):
+        return 0.0
+    parsed = response.get("parsed")
+    if parsed is not None:
+        return min(max(parsed.score, 0.0), 1.0)
+    raw = response.get("raw")
+    return _parse_llm_score(raw.content)[0] if raw is not None else 0.0
+
+
+def _judge_prompts(
+    question: str,
+    expected_answer: str,
+    generated_answer: str,
+    context: str,
+) -> list[PromptValue]:
+    """Render the judge prompts, in ``JUDGE_CRITERIA`` order."""
+    answer, answer_judge = _truncate_tokens(
+        generated_answer, EVAL_MAX_ANSWER_TOKENS, EVAL_MAX_ANSWER_JUDGE_TOKENS,
+    )
+    return [
+        FAITHFULNESS_PROMPT.invoke({
+            "question": question,
+            "context": _truncate_tokens(context, EVAL_MAX_CONTEXT_TOKENS)[0],
+            "answer": answer,
+        }),
+        RELEVANCE_PROMPT.invoke({
+            "question": question,
+            "answer": answer_judge,
+        }),
+        COMPLETENESS_PROMPT.invoke({
+            "question": question,
+            "expected": _truncate_tokens(expected_answer, EVAL_MAX_EXPECTED_TOKENS)[0],
+            "answer": answer_judge,
+        }),
+    ]
+
+
+_OPENAI_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def judge_with_batch_api(
+    prompts: list[list[PromptValue]],
+) -> list[tuple[float, float, float]]:
+    """Score every question's judge prompts through the OpenAI Batch API.
+
+    *prompts* holds, per question, the output of ``_judge_prompts``.
+    Requests are tagged ``"<question>:<criterion>"`` and the call blocks
+    until the batch finishes (half the price, no rate limit, but it can
+    take minutes to hours).  Missing or failed results score 0.
+    """
+    from openai import OpenAI
+
+    lines = []
+    for idx, question_prompts in enumerate(prompts):
+        for criterion, prompt in zip(JUDGE_CRITERIA, question_prompts):
+            lines.append(orjson.dumps({
+                "custom_id": f"{idx}:{criterion}",
+                "method": "POST",
+                "url": EVAL_BATCH_ENDPOINT,
+                "body": {
+                    "model": LLM_MODEL,
+                    "temperature": LLM_JUDGE_TEMPERATURE,
+                    "messages": [
+                        {"role": _OPENAI_ROLES[m.type], "content": m.content}
+                        for m in prompt.to_messages()
+                    ],
+                },
+            }))
+
+    client = OpenAI(api_key=OPENAI_API_KEY, http_client=get_http_client())
+    batch_file = client.files.create(
+        file=("judge_batch.jsonl", b"\n".join(lines)), purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=EVAL_BATCH_ENDPOINT,
+        completion_window=EVAL_BATCH_COMPLETION_WINDOW,
+    )
+    logger.info("Batch judge soumis: %s (%d requetes)", batch.id, len(lines))
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(EVAL_BATCH_POLL_SECONDS)
+        batch = client.batches.retrieve(batch.id)
+
+    scores: dict[str, float] = {}
+    if batch.output_file_id:
+        output = client.files.content(batch.output_file_id).content
+        for line in output.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                continue
+            scores[record["custom_id"]], _ = _parse_llm_score(content or "")
+    if batch.status != "completed":
+        logger.warning("Batch judge %s termine en statut %s", batch.id, batch.status)
+
+    return [
+        tuple(scores.get(f"{idx}:{criterion}", 0.0) for criterion in JUDGE_CRITERIA)
+        for idx in range(len(prompts))
+    ]
+
+
 def evaluate_answer(
     question: str,
     expected_answer: str,
     generated_answer: str,
     context: str,
     keywords: list[str],
-    llm: ChatOpenAI,
+    llm: ChatOpenAI | None,
     embeddings: OpenAIEmbeddings | None = None,
 ) -> AnswerMetrics:
-    """Compute answer-quality metrics using LLM-as-judge, keywords, and semantic similarity."""
+    """Compute answer-quality metrics using LLM-as-judge, keywords, and semantic similarity.
+
+    Without *embeddings* the semantic similarity is left at 0;
+    ``run_evaluation`` fills it in afterwards for the whole dataset.
+    Without *llm* the judge scores are left at 0 (Batch API path).
+    ``judge_version`` records which prompts produced the judge scores.
+    """
     metrics = AnswerMetrics(answer_length=len(generated_answer))
 
     metrics.keyword_coverage = compute_keyword_ratio(generated_answer, keywords)
@@ -385,37 +708,41 @@ def evaluate_answer(
             expected_answer, generated_answer, embeddings,
         )
 
-    try:
-        faith_msgs = FAITHFULNESS_PROMPT.invoke({
-            "question": question,
-            "context": context[:EVAL_MAX_CONTEXT_LENGTH],
-            "answer": generated_answer[:EVAL_MAX_ANSWER_LENGTH],
-        })
-        faith_resp = llm.invoke(faith_msgs)
-        metrics.faithfulness_score, _ = _parse_llm_score(faith_resp.content)
-    except Exception:
-        metrics.faithfulness_score = 0.0
-
-    try:
-        rel_msgs = RELEVANCE_PROMPT.invoke({
-            "question": question,
-            "answer": generated_answer[:EVAL_MAX_ANSWER_JUDGE],
-        })
-        rel_resp = llm.invoke(rel_msgs)
-        metrics.relevance_score, _ = _parse_llm_score(rel_resp.content)
-    except Exception:
-        metrics.relevance_score = 0.0
+    if llm is None:
+        return metrics
 
+    # One structured call scores all three criteria.  Structured output
+    # makes the API return schema-valid JSON; if the call or its parsing
+    # fails anyway, fall back to the three single-criterion prompts.
+    combined = llm.with_structured_output(
+        CombinedJudgeScores, method="json_schema",
+    )
     try:
-        comp_msgs = COMPLETENESS_PROMPT.invoke({
+        verdict = combined.invoke(COMBINED_JUDGE_PROMPT.invoke({
             "question": question,
-            "expected": expected_answer,
-            "answer": generated_answer[:EVAL_MAX_ANSWER_JUDGE],
-        })
-        comp_resp = llm.invoke(comp_msgs)
-        metrics.completeness_score, _ = _parse_llm_score(comp_resp.content)
+            "context": _truncate_tokens(context, EVAL_MAX_CONTEXT_TOKENS)[0],
+            "expected": _truncate_tokens(expected_answer, EVAL_MAX_EXPECTED_TOKENS)[0],
+            "answer": _truncate_tokens(generated_answer, EVAL_MAX_ANSWER_TOKENS)[0],
+        }))
+        faith, rel, comp = (
+            min(max(getattr(verdict, criterion).score, 0.0), 1.0)
+            for criterion in JUDGE_CRITERIA
+        )
+        metrics.judge_version = EVAL_JUDGE_COMBINED
     except Exception:
-        metrics.completeness_score = 0.0
+        logger.debug("Combined judge call failed, scoring criteria separately")
+        # The three judgements are independent: one batch runs them
+        # concurrently.
+        judge = llm.with_structured_output(
+            JudgeScore, method="json_schema", include_raw=True,
+        )
+        prompts = _judge_prompts(question, expected_answer, generated_answer, context)
+        responses = judge.batch(prompts, return_exceptions=True)
+        faith, rel, comp = (_judge_score(resp) for resp in responses)
+        metrics.judge_version = EVAL_JUDGE_SEPARATE
+    metrics.faithfulness_score = faith
+    metrics.relevance_score = rel
+    metrics.completeness_score = comp
 
     return metrics
 
@@ -424,6 +751,140 @@ def evaluate_answer(
 # Main evaluation pipeline
 # ---------------------------------------------------------------------------
 
+class _CachedEmbeddings:
+    """``embed_documents`` backed by an on-disk, content-addressed cache.
+
+    The expected answers never change and generated answers often repeat
+    between runs, so only texts never seen with this model are sent to
+    the API.  Entries are keyed on ``xxh64(model | dimensions | text)``
+    and stored L2-normalised in one ``.npz`` file (key array + float32
+    matrix).
+
+    The instance is shared by concurrent evaluation runs (and their
+    prefetch threads): a lock guards the vectors and the file writes.
+    """
+
+    # Unit vectors: cosine similarity is a plain dot product.
+    normalized = True
+
+    def __init__(self, embeddings: OpenAIEmbeddings, path: Path) -> None:
+        self._embeddings = embeddings
+        self._path = path
+        self._prefix = (
+            f"{getattr(embeddings, 'model', '')}|"
+            f"{getattr(embeddings, 'dimensions', '')}|"
+        )
+        self._lock = threading.Lock()
+        self._vectors: dict[str, np.ndarray] = {}
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    self._vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+            except Exception:
+                logger.warning("Cache d'embeddings illisible: %s", path)
+
+    def _key(self, text: str) -> str:
+        return xxhash.xxh64_hexdigest((self._prefix + text).encode())
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(t) for t in texts]
+        with self._lock:
+            misses = {k: t for k, t in zip(keys, texts) if k not in self._vectors}
+        # The API call runs unlocked: at worst two runs embed the same text.
+        vectors = (
+            self._embeddings.embed_documents(list(misses.values()))
+            if misses else []
+        )
+        with self._lock:
+            for key, vector in zip(misses, vectors):
+                vec = np.asarray(vector, dtype=np.float32)
+                norm = np.linalg.norm(vec)
+                self._vectors[key] = vec / norm if norm else vec
+            if misses:
+                self._save()
+            return [self._vectors[k] for k in keys]
+
+    def _save(self) -> None:
+        """Rewrite the cache file atomically (caller holds ``_lock``).
+
+        The temporary file has a unique name, so another process saving
+        the same cache cannot interleave with this write.
+        """
+        self._path.parent.mkdir(exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self._path.parent, suffix=".npz")
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(
+                    fh,
+                    keys=np.array(list(self._vectors)),
+                    vectors=np.stack(list(self._vectors.values())),
+                )
+            tmp.replace(self._path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+
+@lru_cache(maxsize=1)
+def _get_judge_llm() -> ChatOpenAI:
+    """Process-wide judge LLM on the shared HTTP pool.
+
+    Judge prompts are deterministic (temperature 0), so re-running the
+    same dataset hits the SQLite cache instead of the API.  The cache is
+    attached to the judge only: the generation LLM must still answer live.
+    """
+    from langchain_community.cache import SQLiteCache
+    from langchain_openai import ChatOpenAI
+
+    EVAL_RESULTS_DIR.mkdir(exist_ok=True)
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=LLM_JUDGE_TEMPERATURE,
+        openai_api_key=OPENAI_API_KEY,
+        http_client=get_http_client(),
+        cache=SQLiteCache(
+            database_path=str(EVAL_RESULTS_DIR / EVAL_JUDGE_CACHE_FILENAME)
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_eval_embeddings() -> _CachedEmbeddings:
+    """Process-wide, disk-cached embeddings for semantic similarity.
+
+    Answer similarity does not need the index's dimensions: shortened
+    vectors cut the payload and the cache size.
+    """
+    return _CachedEmbeddings(
+        make_embeddings(dimensions=EVAL_EMBEDDING_DIMENSIONS),
+        EVAL_RESULTS_DIR / EVAL_EMBED_CACHE_FILENAME,
+    )
+
+
+# EvalSummary averages, in the column order used by run_evaluation, and the
+# overall_score weight of each (latency, last, is not scored).
+_SUMMARY_FIELDS: tuple[str, ...] = (
+    "avg_faithfulness",
+    "avg_relevance",
+    "avg_completeness",
+    "avg_keyword_coverage",
+    "avg_semantic_similarity",
+    "avg_subject_match",
+    "avg_keyword_hit",
+    "avg_latency",
+)
+_SUMMARY_WEIGHTS = np.array([
+    EVAL_WEIGHT_FAITHFULNESS,
+    EVAL_WEIGHT_RELEVANCE,
+    EVAL_WEIGHT_COMPLETENESS,
+    EVAL_WEIGHT_KEYWORD_COV,
+    EVAL_WEIGHT_SEMANTIC_SIM,
+    EVAL_WEIGHT_SUBJECT_MATCH,
+    EVAL_WEIGHT_KEYWORD_HIT,
+])
+
+
 def run_evaluation(
     vectorstore: Chroma,
     llm: ChatOpenAI,
@@ -432,10 +893,18 @@ def run_evaluation(
     progress_callback=None,
     bm25_index=None,
     enable_enhanced: bool = True,
+    use_batch_api: bool = False,
+    max_workers: int = EVAL_MAX_WORKERS,
 ) -> EvalSummary:
-    """Run the full evaluation pipeline on the given dataset."""
-    from langchain_core.prompts import ChatPromptTemplate as CPT
+    """Run the full evaluation pipeline on the given dataset.
 
+    Up to *max_workers* questions are evaluated concurrently; lower it
+    for accounts with tight OpenAI rate limits.
+
+    With *use_batch_api* the judge prompts are collected during the loop
+    and scored in one OpenAI Batch API job at the end (see
+    ``judge_with_batch_api``); meant for offline CLI sweeps.
+    """
     if dataset is None:
         dataset = EVAL_DATASET
 
@@ -447,32 +916,44 @@ def run_evaluation(
         except ImportError:
             pass
 
-    judge_llm = ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=LLM_JUDGE_TEMPERATURE,
-        openai_api_key=OPENAI_API_KEY,
-    )
+    judge_llm = _get_judge_llm()
+    eval_embeddings = _get_eval_embeddings()
 
-    eval_embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=OPENAI_API_KEY,
+    # The expected answers are known up front: embed them in the
+    # background while the loop retrieves and generates, so only the
+    # generated answers are left to embed afterwards.
+    prefetch_pool = ThreadPoolExecutor(max_workers=1)
+    expected_prefetch = prefetch_pool.submit(
+        eval_embeddings.embed_documents,
+        [item["expected_answer"][:EVAL_MAX_EMBED_LENGTH] for item in dataset],
     )
+    prefetch_pool.shutdown(wait=False)
 
-    eval_prompt = CPT.from_messages([
-        ("system", SYSTEM_PROMPT),
-        ("human", "{question}"),
-    ])
+    # Plain MMR retrieval embeds each question; the dataset is known up
+    # front, so embed every question in one call instead.
+    question_vectors = None
+    index_embeddings = getattr(vectorstore, "embeddings", None)
+    if enhanced_retrieve is None and index_embeddings is not None:
+        try:
+            question_vectors = index_embeddings.embed_documents(
+                [item["question"] for item in dataset]
+            )
+        except Exception:
+            logger.warning("Embedding groupe des questions echoue, embedding par question")
 
-    results: list[SingleEvalResult] = []
+    progress_lock = threading.Lock()
 
-    for idx, item in enumerate(dataset):
+    def _eval_item(
+        idx: int, item: dict[str, Any],
+    ) -> tuple[SingleEvalResult, list[PromptValue] | None]:
         question = item["question"]
         expected = item["expected_answer"]
         subject = item.get("subject", "")
         keywords = item.get("keywords", [])
 
         if progress_callback:
-            progress_callback(idx, len(dataset), question)
+            with progress_lock:
+                progress_callback(idx, len(dataset), question)
 
         start = time.time()
 
@@ -489,6 +970,12 @@ def run_evaluation(
                 enable_compress=False,
             )
             docs = retrieval_result["documents"]
+        elif question_vectors is not None:
+            docs = vectorstore.max_marginal_relevance_search_by_vector(
+                question_vectors[idx],
+                k=nb_sources,
+                fetch_k=nb_sources * FETCH_K_MULTIPLIER,
+            )
         else:
             search_kwargs = {"k": nb_sources, "fetch_k": nb_sources * FETCH_K_MULTIPLIER}
             retriever = vectorstore.as_retriever(
@@ -499,19 +986,17 @@ def run_evaluation(
 
         context_parts = []
         for doc in docs:
-            matiere = doc.metadata.get(META_MATIERE, DEFAULT_MATIERE)
-            doc_type = doc.metadata.get(META_DOC_TYPE, DEFAULT_DOC_TYPE)
-            filename = doc.metadata.get(META_FILENAME, "")
+            meta = doc.metadata
             context_parts.append(
-                f"[{matiere} -- {doc_type} -- {filename}]\n{doc.page_content}"
+                f"[{meta.get(META_MATIERE, DEFAULT_MATIERE)} -- "
+                f"{meta.get(META_DOC_TYPE, DEFAULT_DOC_TYPE)} -- "
+                f"{meta.get(META_FILENAME, '')}]\n{doc.page_content}"
             )
-        context = "\n\n---\n\n".join(context_parts)
+        context = CONTEXT_SEPARATOR.join(context_parts)
 
-        messages = eval_prompt.invoke({
-            "context": context,
-            "question": question,
-        })
-        response = llm.invoke(messages)
+        # Same messages as the chat endpoint, so the evaluation measures
+        # the prompt the app sends.
+        response = llm.invoke(build_messages(context, [], question))
         generated = response.content
 
         elapsed = time.time() - start
@@ -519,8 +1004,12 @@ def run_evaluation(
         ret_metrics = evaluate_retrieval(docs, subject, keywords)
 
         ans_metrics = evaluate_answer(
-            question, expected, generated, context, keywords, judge_llm,
-            embeddings=eval_embeddings,
+            question, expected, generated, context, keywords,
+            None if use_batch_api else judge_llm,
+        )
+        prompts = (
+            _judge_prompts(question, expected, generated, context)
+            if use_batch_api else None
         )
 
         source_names = list({
@@ -537,47 +1026,88 @@ def run_evaluation(
             latency_seconds=round(elapsed, 2),
             retrieved_sources=source_names,
         )
-        results.append(result)
+        return result, prompts
+
+    # Questions are independent and the work is network-bound, so they
+    # run on a bounded pool (which also caps concurrent OpenAI requests);
+    # map() keeps the results in dataset order.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        outcomes = list(pool.map(_eval_item, range(len(dataset)), dataset))
+    results = [result for result, _ in outcomes]
+    batch_prompts = [prompts for _, prompts in outcomes if prompts is not None]
+
+    try:
+        expected_prefetch.result()
+    except Exception:
+        logger.warning("Pre-embedding des reponses attendues echoue")
+    similarities = compute_semantic_similarities(
+        [(r.expected_answer, r.generated_answer) for r in results],
+        eval_embeddings,
+    )
+    for result, similarity in zip(results, similarities):
+        result.answer.semantic_similarity = similarity
+
+    if use_batch_api and batch_prompts:
+        for result, (faith, rel, comp) in zip(
+            results, judge_with_batch_api(batch_prompts),
+        ):
+            result.answer.faithfulness_score = faith
+            result.answer.relevance_score = rel
+            result.answer.completeness_score = comp
+            result.answer.judge_version = EVAL_JUDGE_SEPARATE
 
     n = len(results)
+    # One row per question; columns follow _SUMMARY_FIELDS.
+    metrics = np.array([
+        (
+            r.answer.faithfulness_score,
+            r.answer.relevance_score,
+            r.answer.completeness_score,
+            r.answer.keyword_coverage,
+            r.answer.semantic_similarity,
+            r.retrieval.subject_match_ratio,
+            r.retrieval.keyword_hit_ratio,
+            r.latency_seconds,
+        )
+        for r in results
+    ], dtype=np.float64).reshape(n, len(_SUMMARY_FIELDS))
+    means = metrics.mean(axis=0) if n else np.zeros(len(_SUMMARY_FIELDS))
+
     summary = EvalSummary(
         total_questions=n,
-        avg_faithfulness=sum(r.answer.faithfulness_score for r in results) / n if n else 0,
-        avg_relevance=sum(r.answer.relevance_score for r in results) / n if n else 0,
-        avg_completeness=sum(r.answer.completeness_score for r in results) / n if n else 0,
-        avg_keyword_coverage=sum(r.answer.keyword_coverage for r in results) / n if n else 0,
-        avg_semantic_similarity=sum(r.answer.semantic_similarity for r in results) / n if n else 0,
-        avg_subject_match=sum(r.retrieval.subject_match_ratio for r in results) / n if n else 0,
-        avg_keyword_hit=sum(r.retrieval.keyword_hit_ratio for r in results) / n if n else 0,
-        avg_latency=sum(r.latency_seconds for r in results) / n if n else 0,
+        **{name: float(value) for name, value in zip(_SUMMARY_FIELDS, means)},
         timestamp=datetime.now().isoformat(timespec="seconds"),
+        judge_version=",".join(sorted({
+            r.answer.judge_version for r in results if r.answer.judge_version
+        })),
         results=[asdict(r) for r in results],
     )
-
-    summary.overall_score = round(
-        EVAL_WEIGHT_FAITHFULNESS * summary.avg_faithfulness
-        + EVAL_WEIGHT_RELEVANCE * summary.avg_relevance
-        + EVAL_WEIGHT_COMPLETENESS * summary.avg_completeness
-        + EVAL_WEIGHT_SEMANTIC_SIM * summary.avg_semantic_similarity
-        + EVAL_WEIGHT_KEYWORD_COV * summary.avg_keyword_coverage
-        + EVAL_WEIGHT_SUBJECT_MATCH * summary.avg_subject_match
-        + EVAL_WEIGHT_KEYWORD_HIT * summary.avg_keyword_hit,
-        4,
-    )
+    summary.overall_score = round(float(_SUMMARY_WEIGHTS @ means[:-1]), 4)
 
     return summary
 
 
 def save_results(summary: EvalSummary, filename: str = EVAL_LATEST_FILENAME) -> Path:
-    """Persist evaluation results to a JSON file + timestamped copy."""
+    """Persist evaluation results to a JSON file + timestamped copy.
+
+    The summary is serialised once, into the timestamped file; the latest
+    file is a hard link to it.  The link is swapped in atomically, so the
+    previous run's history file is never rewritten through it.
+    """
     EVAL_RESULTS_DIR.mkdir(exist_ok=True)
     filepath = EVAL_RESULTS_DIR / filename
-    with open(filepath, "w", encoding="utf-8") as fh:
-        json.dump(asdict(summary), fh, ensure_ascii=False, indent=2)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     history_path = EVAL_RESULTS_DIR / f"eval_{ts}.json"
-    with open(history_path, "w", encoding="utf-8") as fh:
-        json.dump(asdict(summary), fh, ensure_ascii=False, indent=2)
+    history_path.write_bytes(
+        orjson.dumps(asdict(summary), option=orjson.OPT_INDENT_2)
+    )
+    tmp_path = filepath.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(history_path, tmp_path)
+    except OSError:
+        shutil.copyfile(history_path, tmp_path)
+    tmp_path.replace(filepath)
     return filepath
 
 
@@ -588,8 +1118,7 @@ def list_eval_history() -> list[dict]:
     history = []
     for fp in sorted(EVAL_RESULTS_DIR.glob(EVAL_HISTORY_GLOB), reverse=True):
         try:
-            with open(fp, encoding="utf-8") as fh:
-                data = json.load(fh)
+            data = orjson.loads(fp.read_bytes())
             history.append({
                 "filename": fp.name,
                 "timestamp": data.get("timestamp", fp.stem.replace("eval_", "")),
@@ -600,6 +1129,7 @@ def list_eval_history() -> list[dict]:
                 "avg_semantic_similarity": data.get("avg_semantic_similarity", 0),
                 "avg_keyword_coverage": data.get("avg_keyword_coverage", 0),
                 "total_questions": data.get("total_questions", 0),
+                "judge_version": data.get("judge_version", ""),
             })
         except Exception:
             continue
@@ -611,8 +1141,7 @@ def load_results(filename: str = EVAL_LATEST_FILENAME) -> EvalSummary | None:
     filepath = EVAL_RESULTS_DIR / filename
     if not filepath.exists():
         return None
-    with open(filepath, encoding="utf-8") as fh:
-        data = json.load(fh)
+    data = orjson.loads(filepath.read_bytes())
     return EvalSummary(**{k: v for k, v in data.items()})
 
 
@@ -620,7 +1149,7 @@ def load_results(filename: str = EVAL_LATEST_FILENAME) -> EvalSummary | None:
 # CLI entry point
 # ---------------------------------------------------------------------------
 
-def main() -> None:
+def main(use_batch_api: bool = False) -> None:
     """Run evaluation from the command line and print results."""
     print("=" * 55)
     print("Evaluation du systeme RAG - Master 1")
@@ -634,35 +1163,22 @@ def main() -> None:
         print("ERREUR: Base vectorielle introuvable. Lancez: python -m scripts.index")
         return
 
-    embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=OPENAI_API_KEY,
-    )
-    vectorstore = Chroma(
-        persist_directory=str(CHROMA_DIR),
-        embedding_function=embeddings,
-    )
+    from langchain_openai import ChatOpenAI
+
+    vectorstore = open_vectorstore(make_embeddings())
     judge_llm = ChatOpenAI(
         model=LLM_MODEL,
         temperature=LLM_JUDGE_TEMPERATURE,
         openai_api_key=OPENAI_API_KEY,
+        http_client=get_http_client(),
     )
 
     from core.retrieval import BM25Index
-    from langchain_core.documents import Document as LCDoc
-
-    print("Construction de l'index BM25...")
-    bm25_index = None
-    all_docs = vectorstore.get(include=["documents", "metadatas"])
-    if all_docs and all_docs.get("documents"):
-        docs = [
-            LCDoc(page_content=content, metadata=meta or {})
-            for content, meta in zip(
-                all_docs["documents"], all_docs["metadatas"]
-            )
-        ]
-        bm25_index = BM25Index(docs)
-        print(f"  Index BM25: {len(docs)} documents indexes")
+
+    print("Chargement de l'index BM25...")
+    bm25_index = BM25Index.load_or_build(vectorstore, CHROMA_DIR / BM25_INDEX_NAME)
+    if bm25_index is not None:
+        print(f"  Index BM25: {len(bm25_index.documents)} documents indexes")
 
     def progress(idx, total, q):
         print(f"\n  [{idx + 1}/{total}] {q[:70]}...")
@@ -670,6 +1186,7 @@ def main() -> None:
     summary = run_evaluation(
         vectorstore, judge_llm, progress_callback=progress,
         bm25_index=bm25_index, enable_enhanced=True,
+        use_batch_api=use_batch_api,
     )
 
     print("\n" + "=" * 55)
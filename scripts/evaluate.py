@@ -3,9 +3,11 @@
 CLI wrapper for evaluation.
 
 Usage:
-    python -m scripts.evaluate
+    python -m scripts.evaluate              # judge en direct
+    python -m scripts.evaluate -b           # judge via l'API Batch OpenAI
 """
 
+import argparse
 import sys
 from pathlib import Path
 
@@ -13,5 +15,15 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from evaluation.evaluator import main
 
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Evaluation RAG Master 1")
+    parser.add_argument("--batch-api", "-b", action="store_true",
+                        help="Noter les reponses via l'API Batch OpenAI "
+                             "(moitie prix, resultats differes)")
+    args = parser.parse_args()
+    main(use_batch_api=args.batch_api)
+
+
 if __name__ == "__main__":
-    main()
+    cli()
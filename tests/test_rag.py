@@ -16,8 +16,9 @@ from langchain_core.documents import Document
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Skip all tests if no API key
-pytestmark = pytest.mark.skipif(
+# Tests calling the OpenAI API are skipped without a key; the others
+# (BM25, parsing, indexer helpers) run offline.
+requires_api_key = pytest.mark.skipif(
     not OPENAI_API_KEY,
     reason="OPENAI_API_KEY not found in environment",
 )
@@ -27,6 +28,7 @@ pytestmark = pytest.mark.skipif(
 # Unit Tests - Indexation
 # ---------------------------------------------------------------------------
 
+@requires_api_key
 class TestIndexation:
     """Tests for document indexation."""
 
@@ -62,6 +64,7 @@ class TestIndexation:
 # Unit Tests - Retrieval
 # ---------------------------------------------------------------------------
 
+@requires_api_key
 class TestRetrieval:
     """Tests for document retrieval."""
 
@@ -94,6 +97,7 @@ class TestRetrieval:
 class TestRAGImprovements:
     """Tests for RAG improvement components."""
 
+    @requires_api_key
     def test_query_rewrite(self, llm):
         from core.retrieval import rewrite_query
 
@@ -110,6 +114,7 @@ class TestRAGImprovements:
         assert len(results) > 0
         assert results[0][1] > 0
 
+    @requires_api_key
     def test_hybrid_search(self, vectorstore, sample_documents):
         from core.retrieval import BM25Index, hybrid_search
 
@@ -118,6 +123,7 @@ class TestRAGImprovements:
         assert len(results) > 0
         assert all(isinstance(doc, Document) for doc in results)
 
+    @requires_api_key
     def test_compress_documents(self, llm, sample_documents):
         from core.retrieval import compress_documents
 
@@ -131,10 +137,313 @@ class TestRAGImprovements:
         assert all(isinstance(doc, Document) for doc in compressed)
 
 
+class _FakeVectorStore:
+    """Just enough of the Chroma API for ``BM25Index.from_vectorstore``."""
+
+    def __init__(self, documents):
+        self.documents = list(documents)
+        self.ids = [f"id-{i}" for i in range(len(self.documents))]
+        self.full_reads = 0
+
+    def get(self, include=None):
+        result = {"ids": list(self.ids)}
+        if include:
+            self.full_reads += 1
+            result["documents"] = [d.page_content for d in self.documents]
+            result["metadatas"] = [d.metadata for d in self.documents]
+        return result
+
+
+class TestBM25Persistence:
+    """Tests for saving / loading the BM25 index."""
+
+    QUERIES = ["tri fusion algorithme", "apprentissage donnees", "unification termes"]
+
+    @staticmethod
+    def _results(index, text, filter_dict=None):
+        return [
+            (doc.page_content, doc.metadata, round(score, 5))
+            for doc, score in index.query(text, k=3, filter_dict=filter_dict)
+        ]
+
+    def test_save_load_round_trip(self, tmp_path, sample_documents):
+        from core.retrieval import BM25Index
+
+        built = BM25Index.from_vectorstore(_FakeVectorStore(sample_documents))
+        built.save(tmp_path / "bm25")
+        loaded = BM25Index.load(tmp_path / "bm25")
+
+        assert loaded.corpus_digest == built.corpus_digest
+        assert len(loaded.documents) == len(built.documents)
+        for text in self.QUERIES:
+            assert self._results(loaded, text) == self._results(built, text)
+        subject = {"matiere": {"$in": ["Algorithmique"]}}
+        assert (
+            self._results(loaded, "tri algorithme", subject)
+            == self._results(built, "tri algorithme", subject)
+        )
+
+    def test_save_replaces_previous_index(self, tmp_path, sample_documents):
+        from core.retrieval import BM25Index
+
+        path = tmp_path / "bm25"
+        BM25Index(sample_documents).save(path)
+        BM25Index(sample_documents[:1]).save(path)
+
+        assert len(BM25Index.load(path).documents) == 1
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["bm25"]
+
+    def test_stored_documents(self, tmp_path, sample_documents):
+        from core.retrieval import BM25Index
+
+        BM25Index(sample_documents).save(tmp_path / "bm25")
+        docs = BM25Index.load(tmp_path / "bm25").documents
+
+        assert len(docs) == len(sample_documents)
+        assert docs[-1].page_content == sample_documents[-1].page_content
+        assert docs[0].metadata == sample_documents[0].metadata
+        assert [d.page_content for d in docs[1:]] == [
+            d.page_content for d in sample_documents[1:]
+        ]
+        with pytest.raises(IndexError):
+            docs[len(sample_documents)]
+
+    def test_load_or_build_reuses_fresh_index(self, tmp_path, sample_documents):
+        from core.retrieval import BM25Index
+
+        store = _FakeVectorStore(sample_documents)
+        BM25Index.load_or_build(store, tmp_path / "bm25")
+        assert store.full_reads == 1
+
+        index = BM25Index.load_or_build(store, tmp_path / "bm25")
+        assert store.full_reads == 1
+        assert len(index.documents) == len(sample_documents)
+
+    def test_load_or_build_rebuilds_when_ids_change(self, tmp_path, sample_documents):
+        from core.retrieval import BM25Index
+
+        store = _FakeVectorStore(sample_documents)
+        BM25Index.load_or_build(store, tmp_path / "bm25")
+
+        # Same number of chunks, one replaced (e.g. a re-imported video).
+        store.ids[0] = "id-replaced"
+        store.documents[0] = Document(
+            page_content="Les graphes orientes et le parcours en largeur.",
+            metadata={"matiere": "Algorithmique"},
+        )
+        index = BM25Index.load_or_build(store, tmp_path / "bm25")
+
+        assert store.full_reads == 2
+        assert index.query("parcours largeur graphes", k=1)
+        assert BM25Index.load(tmp_path / "bm25").corpus_digest == index.corpus_digest
+
+    @pytest.mark.parametrize("meta", [None, b"{not json"])
+    def test_load_or_build_rebuilds_bad_meta(self, tmp_path, sample_documents, meta):
+        from core.retrieval import BM25Index
+
+        store = _FakeVectorStore(sample_documents)
+        path = tmp_path / "bm25"
+        BM25Index.load_or_build(store, path)
+        if meta is None:
+            (path / "meta.json").unlink()
+        else:
+            (path / "meta.json").write_bytes(meta)
+
+        index = BM25Index.load_or_build(store, path)
+
+        assert store.full_reads == 2
+        assert len(index.documents) == len(sample_documents)
+        assert BM25Index.load(path).corpus_digest == index.corpus_digest
+
+
+def _bm25_corpus():
+    """Documents over a small shared vocabulary, so scores differ."""
+    words = ["tri", "fusion", "graphe", "arbre", "pile", "file", "hachage", "tas"]
+    subjects = ["Algorithmique", "Logique & Prolog", "Cloud & Reseaux"]
+    return [
+        Document(
+            page_content=" ".join(
+                words[(i * j) % len(words)] for j in range(1, 3 + i % 7)
+            ) + f" document{i}",
+            metadata={"matiere": subjects[i % len(subjects)], "chunk_id": f"c{i}"},
+        )
+        for i in range(60)
+    ]
+
+
+class TestBM25Scoring:
+    """Tests for BM25 scoring paths and subject filters."""
+
+    @pytest.mark.parametrize("filter_dict", [
+        None,
+        {"matiere": {"$in": ["Algorithmique", "Logique & Prolog"]}},
+    ])
+    @pytest.mark.parametrize("text", ["tri fusion", "graphe graphe arbre", "tas pile file"])
+    def test_numba_matches_numpy(self, monkeypatch, filter_dict, text):
+        pytest.importorskip("numba")
+        import core.retrieval as retrieval
+
+        docs = _bm25_corpus()
+        index = retrieval.BM25Index(docs)
+
+        def scores():
+            return {
+                doc.metadata["chunk_id"]: score
+                for doc, score in index.query(text, k=len(docs), filter_dict=filter_dict)
+            }
+
+        monkeypatch.setattr(retrieval, "NUMBA_AVAILABLE", False)
+        expected = scores()
+        monkeypatch.setattr(retrieval, "NUMBA_AVAILABLE", True)
+        actual = scores()
+
+        assert expected
+        assert actual.keys() == expected.keys()
+        for chunk_id, score in expected.items():
+            assert actual[chunk_id] == pytest.approx(score, rel=1e-5)
+
+    @pytest.mark.parametrize("filter_dict, expected", [
+        (None, None),
+        ({}, None),
+        ({"doc_type": "CM"}, None),
+        ({"matiere": {"$ne": "Algorithmique"}}, None),
+        ({"matiere": "Algorithmique"}, [True, False, False]),
+        ({"matiere": {"$eq": "Logique & Prolog"}}, [False, False, True]),
+        (
+            {"matiere": {"$in": ["Algorithmique", "Intelligence Artificielle"]}},
+            [True, True, False],
+        ),
+        ({"matiere": {"$in": ["Inconnu"]}}, [False, False, False]),
+        ({"matiere": {"$in": []}}, [False, False, False]),
+    ])
+    def test_allowed_mask(self, sample_documents, filter_dict, expected):
+        from core.retrieval import BM25Index
+
+        mask = BM25Index(sample_documents)._allowed_mask(filter_dict)
+        if expected is None:
+            assert mask is None
+        else:
+            assert mask.tolist() == expected
+
+    def test_query_respects_filter(self, sample_documents):
+        from core.retrieval import BM25Index
+
+        results = BM25Index(sample_documents).query(
+            "tri apprentissage unification", k=3,
+            filter_dict={"matiere": {"$in": ["Algorithmique"]}},
+        )
+        assert [doc.metadata["matiere"] for doc, _ in results] == ["Algorithmique"]
+
+
+class _FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FakeLLM:
+    """``llm.batch`` stand-in answering from the passage's marker."""
+
+    model_name = "fake-model"
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.batches = []
+
+    def batch(self, inputs, config=None, return_exceptions=False):
+        self.batches.append(len(inputs))
+        responses = []
+        for prompt in inputs:
+            text = prompt.to_string()
+            marker = next(m for m in self.replies if m in text)
+            reply = self.replies[marker]
+            responses.append(reply if isinstance(reply, Exception) else _FakeResponse(reply))
+        return responses
+
+
+@pytest.fixture
+def memory_llm_cache(monkeypatch):
+    """Fresh in-memory LLM cache, so tests neither read nor write the disk one."""
+    import core.cache
+    import core.retrieval
+
+    monkeypatch.setattr(core.cache, "DISKCACHE_AVAILABLE", False)
+    cache = core.cache.LLMResultCache()
+    monkeypatch.setattr(core.retrieval, "get_llm_cache", lambda: cache)
+    return cache
+
+
+class TestRetrievalHelpers:
+    """Tests for the LLM-output parsing and deduplication helpers."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ('{"score": 7}', {"score": 7}),
+        ('  {"score": 7}\n', {"score": 7}),
+        ('```json\n{"score": 7, "extrait": "a"}\n```', {"score": 7, "extrait": "a"}),
+        ('Voici le JSON : {"rewritten": "x}y", "keywords": []} merci', {"rewritten": "x}y", "keywords": []}),
+        ('{"a": {"b": 2}} puis {"c": 3}', {"a": {"b": 2}}),
+        ('{pas du json} {"score": 4}', {"score": 4}),
+        ('{"escaped": "a\\"}"}', {"escaped": 'a"}'}),
+        ("pas de JSON ici", None),
+        ("[1, 2]", None),
+        ('{"score": 7', None),
+    ])
+    def test_extract_json(self, text, expected):
+        from core.retrieval import extract_json
+
+        assert extract_json(text) == expected
+
+    def test_dedupe_documents(self):
+        from core.retrieval import _dedupe_documents
+
+        docs = [
+            Document(page_content="a", metadata={"chunk_id": "x", "filename": "f"}),
+            # Same chunk_id: dropped even though the content differs.
+            Document(page_content="compresse", metadata={"chunk_id": "x", "filename": "f"}),
+            # No chunk_id: identity is filename + content.
+            Document(page_content="b", metadata={"filename": "f"}),
+            Document(page_content="b", metadata={"filename": "f"}),
+            Document(page_content="b", metadata={"filename": "g"}),
+        ]
+        assert _dedupe_documents(docs) == [docs[0], docs[2], docs[4]]
+
+    def test_rerank_and_compress(self, memory_llm_cache):
+        from core.retrieval import rerank_and_compress
+
+        filler = " contenu de cours" * 15  # above COMPRESS_MIN_LENGTH
+        docs = [
+            Document(page_content="DOC_OFF" + filler, metadata={"filename": "off"}),
+            Document(page_content="DOC_SHORT", metadata={"filename": "short"}),
+            Document(page_content="DOC_TOP" + filler, metadata={"filename": "top"}),
+            Document(page_content="DOC_BAD" + filler, metadata={"filename": "bad"}),
+            Document(page_content="DOC_FAIL" + filler, metadata={"filename": "fail"}),
+        ]
+        llm = _FakeLLM({
+            "DOC_OFF": '{"score": 2, "extrait": "NON_PERTINENT"}',
+            "DOC_SHORT": '{"score": 6, "extrait": "ignore"}',
+            "DOC_TOP": '{"score": 9, "extrait": "le passage pertinent, garde tel quel"}',
+            "DOC_BAD": "Je dirais 7 sur 10.",
+            "DOC_FAIL": RuntimeError("timeout"),
+        })
+
+        out = rerank_and_compress("question", docs, llm, top_k=5, max_docs=6)
+
+        assert llm.batches == [5]
+        assert [d.metadata["filename"] for d in out] == ["top", "bad", "short", "fail"]
+        assert out[0].page_content == "le passage pertinent, garde tel quel"
+        assert out[0].metadata["compressed"] is True
+        assert out[1] is docs[3] and out[2] is docs[1] and out[3] is docs[4]
+
+        # Parsed replies are cached; the unparseable and failed ones are retried.
+        again = rerank_and_compress("question", docs, llm, top_k=5, max_docs=6)
+        assert llm.batches == [5, 2]
+        assert [d.page_content for d in again] == [d.page_content for d in out]
+
+
 # ---------------------------------------------------------------------------
 # Integration Tests - Full RAG Pipeline
 # ---------------------------------------------------------------------------
 
+@requires_api_key
 class TestFullPipeline:
     """Integration tests for the complete RAG pipeline."""
 
@@ -187,6 +496,7 @@ class TestFullPipeline:
 # Integration Tests - Evaluation
 # ---------------------------------------------------------------------------
 
+@requires_api_key
 class TestEvaluation:
     """Tests for the evaluation system."""
 
@@ -238,6 +548,38 @@ class TestEvaluation:
         assert len(summary.results) == 2
 
 
+class TestNormalizeText:
+    """``_normalize_text`` must match the plain NFD + combining-mark filter."""
+
+    @staticmethod
+    def _reference(text):
+        import unicodedata
+
+        text = unicodedata.normalize("NFD", text.lower())
+        return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+    @pytest.mark.parametrize("text", [
+        "",
+        "Systemes Distribues",
+        "Élève à l'école : « déjà vu » — coût 5 €",
+        "ŒUVRE, cœur, Ægir, naïve, Noël, ça",
+        "e\u0301 combine, ﬁ ligature, Ångström, ΑΘΗΝΑ",
+    ])
+    def test_matches_reference(self, text):
+        from evaluation.evaluator import _normalize_text
+
+        assert _normalize_text(text) == self._reference(text)
+
+    def test_matches_reference_per_code_point(self):
+        from evaluation.evaluator import _normalize_text
+
+        for cp in range(0x3000):
+            if 0xD800 <= cp <= 0xDFFF:
+                continue
+            c = chr(cp)
+            assert _normalize_text(c) == self._reference(c), hex(cp)
+
+
 # ---------------------------------------------------------------------------
 # Unit Tests - Indexer Utils
 # ---------------------------------------------------------------------------
@@ -252,7 +594,7 @@ class TestIndexerUtils:
         test_file.write_text("Hello World")
 
         hash1 = compute_file_hash(str(test_file))
-        assert len(hash1) == 32
+        assert len(hash1) == 16
 
         hash2 = compute_file_hash(str(test_file))
         assert hash1 == hash2
@@ -269,6 +611,23 @@ class TestIndexerUtils:
         assert should_exclude_path(str(base / ".git" / "config"), base)
         assert not should_exclude_path(str(base / "docs" / "file.pdf"), base)
 
+    def test_watcher_skips_same_files_as_indexer(self, tmp_path):
+        from core.indexer import should_exclude_path
+        from core.watcher import get_directory_hash
+
+        for rel in ["cm/cours.pdf", "td/td1.txt", ".git/notes.txt",
+                    "node_modules/pkg/readme.txt", "__pycache__/cache.txt"]:
+            path = tmp_path / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("contenu")
+
+        watched = set(get_directory_hash(tmp_path))
+        assert watched == {
+            str(p) for p in tmp_path.rglob("*")
+            if p.is_file() and not should_exclude_path(str(p), tmp_path)
+        }
+        assert watched == {str(tmp_path / "cm" / "cours.pdf"), str(tmp_path / "td" / "td1.txt")}
+
 
 # ---------------------------------------------------------------------------
 # Run Tests